@@ -0,0 +1,134 @@
+"""
+MIT License
+
+Copyright (c) 2024-present IsThrill
+Originally created by ltzmax (2022-2025)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+from collections import deque
+from datetime import timedelta
+from typing import Deque, Dict, List, Tuple, Union
+
+import discord
+from red_commons.logging import getLogger
+
+from .metrics import metrics
+from .utils import add_reaction
+
+logger = getLogger("red.thrillcogs.counting.actions")
+
+# Discord deletes at most 100 messages per bulk call, and only messages younger than 14 days.
+BULK_DELETE_LIMIT = 100
+BULK_DELETE_MAX_AGE = timedelta(days=14) - timedelta(minutes=5)
+
+Deletable = Union[discord.Message, discord.Object]
+
+
+class ActionQueue:
+    """
+    Per-channel queues for reactions and message deletions, run off the message handler path.
+
+    Each channel gets at most one reaction worker and one delete worker, so requests against
+    the same rate-limit bucket never run in parallel. Deletions that pile up while a delete
+    request is in flight are sent together in the next ``channel.delete_messages`` call, so a
+    burst of invalid counts costs a few bulk deletes instead of one request per message.
+    Workers exit as soon as their queue is empty.
+    """
+
+    def __init__(self):
+        self._deletes: Dict[int, Tuple[discord.abc.Messageable, List[Deletable]]] = {}
+        self._reactions: Dict[int, Deque[Tuple[discord.Message, str]]] = {}
+        self._workers: Dict[Tuple[str, int], asyncio.Task] = {}
+
+    def delete(self, channel: discord.abc.Messageable, message: Deletable) -> None:
+        """Queue a message for deletion."""
+        pending = self._deletes.get(channel.id)
+        if pending is None:
+            pending = self._deletes[channel.id] = (channel, [])
+        pending[1].append(message)
+        self._ensure_worker("delete", channel.id, self._run_deletes)
+
+    def react(self, message: discord.Message, reaction: str) -> None:
+        """Queue a reaction to be added to a message."""
+        self._reactions.setdefault(message.channel.id, deque()).append((message, reaction))
+        self._ensure_worker("react", message.channel.id, self._run_reactions)
+
+    async def close(self, timeout: float = 5) -> None:
+        """Give queued actions ``timeout`` seconds to finish, then cancel what is left."""
+        tasks = list(self._workers.values())
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+        self._workers.clear()
+        self._deletes.clear()
+        self._reactions.clear()
+
+    def _ensure_worker(self, kind: str, channel_id: int, run) -> None:
+        key = (kind, channel_id)
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(run(channel_id))
+
+    async def _run_deletes(self, channel_id: int) -> None:
+        try:
+            while (pending := self._deletes.pop(channel_id, None)) is not None:
+                channel, messages = pending
+                await self._delete_batch(channel, messages)
+        finally:
+            self._workers.pop(("delete", channel_id), None)
+
+    async def _delete_batch(
+        self, channel: discord.abc.Messageable, messages: List[Deletable]
+    ) -> None:
+        cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+        recent = [m for m in messages if m.created_at > cutoff]
+        # Older messages can only be deleted one at a time.
+        chunks = [
+            recent[i : i + BULK_DELETE_LIMIT] for i in range(0, len(recent), BULK_DELETE_LIMIT)
+        ]
+        chunks.extend([m] for m in messages if m.created_at <= cutoff)
+        for chunk in chunks:
+            try:
+                with metrics.timer("api.delete"):
+                    await channel.delete_messages(chunk)
+            except discord.HTTPException as e:
+                if len(chunk) == 1:
+                    logger.warning(f"Failed to delete message {chunk[0].id} in {channel.id}: {e}")
+                    continue
+                # One bad message fails the whole bulk call, so retry the rest individually.
+                logger.debug(f"Bulk delete failed in {channel.id}, deleting one by one: {e}")
+                for message in chunk:
+                    try:
+                        with metrics.timer("api.delete"):
+                            await channel.delete_messages([message])
+                    except discord.HTTPException as e:
+                        logger.warning(f"Failed to delete message {message.id} in {channel.id}: {e}")
+
+    async def _run_reactions(self, channel_id: int) -> None:
+        try:
+            queue = self._reactions.get(channel_id)
+            while queue:
+                message, reaction = queue.popleft()
+                await add_reaction(message, reaction)
+        finally:
+            self._reactions.pop(channel_id, None)
+            self._workers.pop(("react", channel_id), None)
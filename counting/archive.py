@@ -0,0 +1,202 @@
+"""
+MIT License
+
+Copyright (c) 2024-present IsThrill
+Originally created by ltzmax (2022-2025)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, Optional, Tuple
+
+# (message_id, author_id, is_bot, content), the same shape the history scanner consumes.
+MessageRecord = Tuple[int, int, bool, str]
+
+_CHUNK_SIZE = 1 << 16
+# A single message object (or header string) bigger than this is treated as a broken export.
+_MAX_ITEM_SIZE = 8 << 20
+_SEPARATORS = re.compile(r"[\s,]*").match
+
+
+class ArchiveError(ValueError):
+    """Raised when an exported message archive can't be read."""
+
+
+def detect_format(path: Path) -> str:
+    """
+    Return ``"ndjson"`` or ``"dce"`` for an exported message archive.
+
+    NDJSON files hold one message object per line, recognised by a first line that is a
+    message (it has an ``id``) rather than an export with a ``messages`` array. Anything else
+    that starts with an object is treated as a DiscordChatExporter JSON export with a top-level ``messages`` array.
+    """
+    with open(path, "r", encoding="utf-8-sig") as fp:
+        first_line = fp.readline().strip()
+    if not first_line.startswith("{"):
+        raise ArchiveError("The file is not a JSON or NDJSON message export.")
+    try:
+        obj = json.loads(first_line)
+    except json.JSONDecodeError:
+        return "dce"
+    if isinstance(obj, dict) and "messages" not in obj and "id" in obj:
+        return "ndjson"
+    return "dce"
+
+
+def iter_archive(path: Path, after_id: Optional[int] = None) -> Iterator[MessageRecord]:
+    """
+    Stream message records from an exported archive, oldest first.
+
+    The file is read incrementally and never loaded whole. Records with an id at or below
+    ``after_id`` are skipped so an interrupted build can resume. The file is closed when the
+    iterator is exhausted or closed.
+    """
+    fmt = detect_format(path)
+    with open(path, "r", encoding="utf-8-sig") as fp:
+        objects = _iter_ndjson(fp) if fmt == "ndjson" else _iter_json_array(fp, "messages")
+        for obj in objects:
+            record = _to_record(obj)
+            if record is None or (after_id is not None and record[0] <= after_id):
+                continue
+            yield record
+
+
+def _to_record(obj: Dict[str, Any]) -> Optional[MessageRecord]:
+    """Normalize a DiscordChatExporter, Discord API or flat NDJSON message object."""
+    if not isinstance(obj, dict) or "id" not in obj:
+        return None
+    author = obj.get("author")
+    if isinstance(author, dict):
+        author_id = author.get("id")
+        is_bot = author.get("isBot", author.get("bot", False))
+    else:
+        author_id = obj.get("author_id")
+        is_bot = obj.get("is_bot", obj.get("bot", False))
+    if author_id is None:
+        return None
+    try:
+        return int(obj["id"]), int(author_id), bool(is_bot), obj.get("content") or ""
+    except (TypeError, ValueError):
+        return None
+
+
+def _iter_ndjson(fp: IO[str]) -> Iterator[Dict[str, Any]]:
+    for line_number, line in enumerate(fp, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ArchiveError(f"Invalid JSON on line {line_number}: {e}") from None
+
+
+def _seek_array(fp: IO[str], key: str) -> str:
+    """
+    Read up to the ``[`` that opens the top-level ``key`` array and return the text after it.
+
+    Nesting and strings are tracked, so a ``key`` string nested in the header (or used as a
+    value) is not mistaken for the array.
+    """
+    buffer = ""
+    i = 0
+    depth = 0
+    string_start = -1  # Start of the string being read, or -1 outside strings.
+    escaped = False
+    last_key: Optional[str] = None  # A string just closed at depth 1, which may be a key.
+    expect_array = False
+    while True:
+        if i == len(buffer):
+            chunk = fp.read(_CHUNK_SIZE)
+            if not chunk:
+                raise ArchiveError(f"No `{key}` array found in the export.")
+            if string_start == -1:
+                buffer, i = chunk, 0
+            else:
+                if i - string_start > _MAX_ITEM_SIZE:
+                    raise ArchiveError("The export header is malformed.")
+                buffer, i = buffer[string_start:] + chunk, i - string_start
+                string_start = 0
+        c = buffer[i]
+        if string_start != -1:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                if depth == 1 and not expect_array:
+                    last_key = json.loads(buffer[string_start : i + 1])
+                string_start = -1
+        elif c in " \t\r\n":
+            pass
+        elif expect_array:
+            if c != "[":
+                raise ArchiveError(f"`{key}` in the export is not a list.")
+            return buffer[i + 1 :]
+        elif c == '"':
+            string_start = i
+        elif c == ":" and depth == 1 and last_key == key:
+            expect_array = True
+        else:
+            if c in "{[":
+                if depth == 0 and c != "{":
+                    raise ArchiveError("The export is not a JSON object.")
+                depth += 1
+            elif c in "}]":
+                depth -= 1
+                if depth == 0:
+                    raise ArchiveError(f"No `{key}` array found in the export.")
+            last_key = None
+        i += 1
+
+
+def _iter_json_array(fp: IO[str], key: str) -> Iterator[Dict[str, Any]]:
+    """Yield the items of the top-level ``key`` array one at a time from a large JSON file."""
+    decoder = json.JSONDecoder()
+    buffer = _seek_array(fp, key)
+    pos = 0
+    read_size = _CHUNK_SIZE
+    while True:
+        pos = _SEPARATORS(buffer, pos).end()
+        if pos < len(buffer):
+            if buffer[pos] == "]":
+                return
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                pass
+            else:
+                yield obj
+                pos = end
+                read_size = _CHUNK_SIZE
+                continue
+        # The next item is incomplete; drop what was consumed and read more of the file.
+        if len(buffer) - pos > _MAX_ITEM_SIZE:
+            raise ArchiveError("The export has a malformed or oversized message.")
+        chunk = fp.read(read_size)
+        if not chunk:
+            raise ArchiveError("The export ended before the message list was closed.")
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        # Each retry decodes the item from its start again, so grow the reads to keep that
+        # linear for large items.
+        read_size *= 2
@@ -0,0 +1,405 @@
+"""
+MIT License
+
+Copyright (c) 2024-present IsThrill
+Originally created by ltzmax (2022-2025)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import itertools
+import time
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import discord
+from red_commons.logging import getLogger
+from redbot.core import Config
+
+from .archive import ArchiveError, iter_archive
+from .scanner import SequenceScanner
+
+logger = getLogger("red.thrillcogs.counting.builder")
+
+# A checkpoint is written after this many messages or seconds, whichever comes first.
+CHECKPOINT_MESSAGES = 5000
+CHECKPOINT_SECONDS = 60
+# History is split into at most SCAN_SEGMENTS time ranges of at least a day each, and up to
+# SCAN_CONCURRENCY of them are fetched at once, each buffering SEGMENT_BUFFER messages.
+SCAN_SEGMENTS = 32
+SCAN_CONCURRENCY = 4
+SEGMENT_BUFFER = 1000
+MIN_SEGMENT_MS = 86_400_000
+# Archive records are parsed in a worker thread in batches of this size.
+ARCHIVE_BATCH = 5000
+# Progress is reported at most once every this many seconds, independently of the scan.
+PROGRESS_INTERVAL = 5
+# Most messages a single catch-up scans; running it again continues from where it stopped.
+CATCHUP_LIMIT = 10000
+
+
+def new_build_state(
+    channel_id: int,
+    merge: bool,
+    leaderboard: Dict[int, int],
+    *,
+    archive_path: Optional[str] = None,
+    delete_archive: bool = False,
+) -> Dict[str, Any]:
+    """
+    Return the initial, JSON-serializable state of a leaderboard build.
+
+    With ``archive_path`` the build reads an exported message archive instead of the
+    channel's history; ``delete_archive`` removes the file once the build is finished.
+    """
+    return {
+        "channel_id": channel_id,
+        "merge": merge,
+        "archive_path": archive_path,
+        "delete_archive": delete_archive,
+        "started_at": datetime.now(timezone.utc).timestamp(),
+        "checkpoint_at": None,
+        "last_message_id": None,
+        "leaderboard": {str(k): v for k, v in leaderboard.items()},
+        "message_count": 0,
+        "valid_counts": 0,
+        "expected_next": 1,
+        "highest_count_found": 0,
+        "skipped_non_numeric": 0,
+        "issues": {
+            "bot_messages": 0,
+            "same_user_violations": 0,
+            "out_of_sequence": 0,
+        },
+    }
+
+
+class LeaderboardBuild:
+    """
+    A resumable scan of a counting channel's history.
+
+    The scan runs as a background task and periodically checkpoints its position (the last
+    processed message id) and partial results to the guild's ``build_checkpoint`` in Config.
+    If the bot restarts or the task fails, a new build can pick up from that checkpoint.
+
+    Progress is reported by a separate task on a timer, so the scan itself never waits on
+    status message edits and runs at the speed of the history API. The sequence logic itself
+    lives in :class:`SequenceScanner`.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        guild: discord.Guild,
+        channel: discord.TextChannel,
+        state: Dict[str, Any],
+    ):
+        self.config = config
+        self.guild = guild
+        self.channel = channel
+        self._state = state
+        self.scanner = SequenceScanner.from_state(state)
+        self.task: Optional[asyncio.Task] = None
+        self._discard = False
+        self._checkpoint_count = state["message_count"]
+        self._checkpoint_time = time.monotonic()
+        self._run_started = time.monotonic()
+        self._run_start_count = state["message_count"]
+        self._run_first_id: Optional[int] = None
+        self._run_until = discord.utils.utcnow()
+
+    @staticmethod
+    async def load_checkpoint(config: Config, guild: discord.Guild) -> Dict[str, Any]:
+        """Return the saved build state for a guild, or an empty dict."""
+        return await config.guild(guild).build_checkpoint()
+
+    @property
+    def state(self) -> Dict[str, Any]:
+        """The build state with the scanner's current totals."""
+        self.scanner.export_state(self._state, leaderboard=False)
+        return self._state
+
+    @property
+    def leaderboard(self) -> Dict[int, int]:
+        return self.scanner.counts
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def messages_per_second(self) -> float:
+        """Scan speed since this run started."""
+        elapsed = time.monotonic() - self._run_started
+        if elapsed <= 0:
+            return 0.0
+        return (self.scanner.message_count - self._run_start_count) / elapsed
+
+    def eta_seconds(self) -> Optional[float]:
+        """
+        Estimate the time left from how far the scan has moved through the channel's timeline.
+
+        Message ids are snowflakes, so the position between the first message of this run and
+        the moment the run started gives the fraction done without knowing the message total.
+        """
+        if self._run_first_id is None or not self._state["last_message_id"]:
+            return None
+        start = discord.utils.snowflake_time(self._run_first_id)
+        current = discord.utils.snowflake_time(self._state["last_message_id"])
+        span = (self._run_until - start).total_seconds()
+        done = (current - start).total_seconds()
+        if span <= 0 or done <= 0:
+            return None
+        fraction = min(done / span, 1.0)
+        return (time.monotonic() - self._run_started) * (1 - fraction) / fraction
+
+    def start(
+        self,
+        on_progress: Callable[["LeaderboardBuild"], Awaitable[None]],
+        on_done: Callable[["LeaderboardBuild", Optional[BaseException]], Awaitable[None]],
+    ) -> asyncio.Task:
+        """Start scanning in the background."""
+        self.task = asyncio.create_task(self._run(on_progress, on_done))
+        return self.task
+
+    async def stop(self, *, discard: bool = False) -> None:
+        """
+        Stop a running scan.
+
+        The checkpoint is kept so the build can be resumed, unless ``discard`` is set.
+        """
+        self._discard = discard
+        if self.running:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if discard:
+            await self._clear_checkpoint()
+
+    async def _clear_checkpoint(self) -> None:
+        await self.config.guild(self.guild).build_checkpoint.clear()
+        if self._state.get("archive_path") and self._state.get("delete_archive"):
+            Path(self._state["archive_path"]).unlink(missing_ok=True)
+
+    async def save_checkpoint(self) -> None:
+        self.scanner.export_state(self._state)
+        self._state["checkpoint_at"] = datetime.now(timezone.utc).timestamp()
+        await self.config.guild(self.guild).build_checkpoint.set(self._state)
+        self._checkpoint_count = self.scanner.message_count
+        self._checkpoint_time = time.monotonic()
+
+    async def _report_progress(self, on_progress) -> None:
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            try:
+                await on_progress(self)
+            except Exception as e:
+                logger.debug(f"Failed to report build progress in guild {self.guild.id}: {e}")
+
+    async def _run(self, on_progress, on_done) -> None:
+        self._run_started = time.monotonic()
+        self._run_start_count = self.scanner.message_count
+        self._run_until = discord.utils.utcnow()
+        reporter = asyncio.create_task(self._report_progress(on_progress))
+        try:
+            try:
+                if self._state.get("archive_path"):
+                    await self._scan_archive()
+                else:
+                    await self._scan()
+            finally:
+                reporter.cancel()
+        except asyncio.CancelledError:
+            if not self._discard:
+                await self.save_checkpoint()
+            raise
+        except ArchiveError as e:
+            # Resuming can't fix an unreadable archive, so there is nothing worth keeping.
+            logger.warning(f"Leaderboard build from archive failed in guild {self.guild.id}: {e}")
+            await self._clear_checkpoint()
+            await self._notify_done(on_done, e)
+            return
+        except Exception as e:
+            logger.error(
+                f"Leaderboard build failed in guild {self.guild.id}, checkpoint kept: {e}",
+                exc_info=True,
+            )
+            await self.save_checkpoint()
+            await self._notify_done(on_done, e)
+            return
+        try:
+            await self._notify_done(on_done, None)
+        finally:
+            # Dropped even if reporting failed: the results may already be applied, and
+            # resuming would apply them again.
+            await self._clear_checkpoint()
+
+    async def _notify_done(self, on_done, error: Optional[Exception]) -> None:
+        try:
+            await on_done(self, error)
+        except Exception:
+            logger.exception(f"Failed to finish the leaderboard build in guild {self.guild.id}")
+
+    def _segments(self) -> List[Tuple[int, Optional[int]]]:
+        """
+        Split the remaining history into ``(after, before)`` snowflake ranges.
+
+        Both bounds are exclusive; each segment starts one id below the previous segment's
+        ``before`` so no message falls between them. The last segment is open-ended so messages
+        posted while the scan runs are still included, as with a single history iterator.
+        """
+        lower = self._state["last_message_id"] or self.channel.id
+        lower_ms = lower >> 22
+        upper_ms = discord.utils.time_snowflake(self._run_until) >> 22
+        count = max(1, min(SCAN_SEGMENTS, (upper_ms - lower_ms) // MIN_SEGMENT_MS))
+        step = (upper_ms - lower_ms) // count
+        bounds = [(lower_ms + step * i) << 22 for i in range(1, count)]
+        afters = [lower] + [bound - 1 for bound in bounds]
+        befores: List[Optional[int]] = bounds + [None]
+        return list(zip(afters, befores))
+
+    async def _fetch_segment(self, after: int, before: Optional[int], queue: asyncio.Queue) -> None:
+        """Stream one segment's messages into ``queue`` as compact tuples, then ``None``."""
+        try:
+            async for message in self.channel.history(
+                limit=None,
+                oldest_first=True,
+                after=discord.Object(id=after),
+                before=discord.Object(id=before) if before else None,
+            ):
+                await queue.put(
+                    (message.id, message.author.id, message.author.bot, message.content)
+                )
+        except Exception as e:
+            await queue.put(e)
+        else:
+            await queue.put(None)
+
+    async def _scan(self) -> None:
+        """
+        Scan the remaining history with up to ``SCAN_CONCURRENCY`` segments fetched at once.
+
+        Segments are consumed strictly in order, so the lenient sequence state carries across
+        segment boundaries exactly as in a serial scan. Each segment buffers at most
+        ``SEGMENT_BUFFER`` messages ahead of the consumer.
+        """
+        segments = self._segments()
+        window: Deque[Tuple[asyncio.Task, asyncio.Queue]] = deque()
+        next_segment = 0
+
+        def start_next() -> None:
+            nonlocal next_segment
+            if next_segment < len(segments):
+                queue: asyncio.Queue = asyncio.Queue(SEGMENT_BUFFER)
+                task = asyncio.create_task(self._fetch_segment(*segments[next_segment], queue))
+                window.append((task, queue))
+                next_segment += 1
+
+        try:
+            for _ in range(SCAN_CONCURRENCY):
+                start_next()
+            while window:
+                _, queue = window[0]
+                while (record := await queue.get()) is not None:
+                    if isinstance(record, Exception):
+                        raise record
+                    self._process(*record)
+                    await self._maybe_checkpoint()
+                window.popleft()
+                start_next()
+        finally:
+            for task, _ in window:
+                task.cancel()
+
+    async def _scan_archive(self) -> None:
+        """Stream an exported archive through the scanner, parsing it in a worker thread."""
+        records = iter_archive(
+            Path(self._state["archive_path"]), after_id=self._state["last_message_id"]
+        )
+        reading: Optional[asyncio.Future] = None
+        try:
+            while True:
+                reading = asyncio.ensure_future(
+                    asyncio.to_thread(list, itertools.islice(records, ARCHIVE_BATCH))
+                )
+                # Shielded so a cancelled build can still wait for the thread to let go of
+                # the file before closing it.
+                batch = await asyncio.shield(reading)
+                if not batch:
+                    break
+                if self._run_first_id is None:
+                    self._run_first_id = batch[0][0]
+                self.scanner.feed_many(record[1:] for record in batch)
+                self._state["last_message_id"] = batch[-1][0]
+                await self._maybe_checkpoint()
+        except (OSError, UnicodeDecodeError) as e:
+            raise ArchiveError(f"Could not read the archive: {e}") from e
+        finally:
+            if reading is not None and not reading.done():
+                await asyncio.wait([reading])
+            records.close()
+
+    async def _maybe_checkpoint(self) -> None:
+        if (
+            self.scanner.message_count - self._checkpoint_count >= CHECKPOINT_MESSAGES
+            or time.monotonic() - self._checkpoint_time >= CHECKPOINT_SECONDS
+        ):
+            await self.save_checkpoint()
+
+    def _process(self, message_id: int, author_id: int, is_bot: bool, content: str) -> None:
+        self._state["last_message_id"] = message_id
+        if self._run_first_id is None:
+            self._run_first_id = message_id
+        self.scanner.feed(author_id, is_bot, content)
+
+
+async def catch_up(
+    channel: discord.TextChannel, after_id: int, count: int, limit: int = CATCHUP_LIMIT
+) -> Dict[str, Any]:
+    """
+    Scan the messages posted after ``after_id`` and continue the count from ``count``.
+
+    Unlike a full build, a stray '1' does not restart the sequence: only the next expected
+    number is credited. Only messages posted before the scan started are read, since newer
+    ones are handled by ``on_message`` once the caller releases the channel's sequencer. The result holds the new ``count``, ``last_user_id`` and
+    ``last_message_id``, the per-user ``credits`` to add and scan statistics.
+    """
+    scanner = SequenceScanner(restarts=False)
+    scanner.expected_next = count + 1
+    last_message_id = after_id
+    before = discord.Object(id=discord.utils.time_snowflake(datetime.now(timezone.utc)))
+    async for message in channel.history(
+        limit=limit, oldest_first=True, after=discord.Object(id=after_id), before=before
+    ):
+        last_message_id = message.id
+        scanner.feed(message.author.id, message.author.bot, message.content)
+    return {
+        "count": scanner.expected_next - 1,
+        "last_user_id": scanner.last_author_id,
+        "last_message_id": last_message_id,
+        "credits": scanner.counts,
+        "message_count": scanner.message_count,
+        "valid_counts": scanner.valid_counts,
+        "out_of_sequence": scanner.out_of_sequence,
+        "truncated": scanner.message_count >= limit,
+    }
@@ -0,0 +1,116 @@
+"""
+MIT License
+
+Copyright (c) 2024-present IsThrill
+Originally created by ltzmax (2022-2025)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+import discord
+from red_commons.logging import getLogger
+
+logger = getLogger("red.thrillcogs.counting.burst")
+
+# A channel enters burst mode after BURST_THRESHOLD invalid messages within BURST_WINDOW
+# seconds, and leaves it once BURST_QUIET seconds pass without one.
+BURST_THRESHOLD = 8
+BURST_WINDOW = 5.0
+BURST_QUIET = 10.0
+
+BurstEndCallback = Callable[[discord.abc.Messageable, int, float], Awaitable[None]]
+
+
+class _ChannelBurst:
+    __slots__ = ("recent", "active", "suppressed", "started", "last", "task")
+
+    def __init__(self):
+        self.recent: Deque[float] = deque(maxlen=BURST_THRESHOLD)
+        self.active = False
+        self.suppressed = 0
+        self.started = 0.0
+        self.last = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+
+class BurstGuard:
+    """
+    Detects floods of invalid messages per channel.
+
+    While a channel is in burst mode, invalid messages should only be queued for deletion,
+    with no per-message reply. When the flood ends, ``on_end(channel, suppressed, duration)``
+    is called once so a single summary can be posted.
+    """
+
+    def __init__(self, on_end: BurstEndCallback):
+        self.on_end = on_end
+        self._channels: Dict[int, _ChannelBurst] = {}
+
+    def is_active(self, channel_id: int) -> bool:
+        state = self._channels.get(channel_id)
+        return state is not None and state.active
+
+    def record(self, channel: discord.abc.Messageable) -> bool:
+        """Record an invalid message and return whether the channel is in burst mode."""
+        now = time.monotonic()
+        state = self._channels.get(channel.id)
+        if state is None:
+            state = self._channels[channel.id] = _ChannelBurst()
+        state.last = now
+        if state.active:
+            state.suppressed += 1
+            return True
+
+        state.recent.append(now)
+        if len(state.recent) < BURST_THRESHOLD or now - state.recent[0] > BURST_WINDOW:
+            return False
+
+        logger.info(f"Spam burst detected in channel {channel.id}")
+        state.active = True
+        state.started = state.recent[0]
+        # The earlier messages in the window were already handled one by one.
+        state.suppressed = 1
+        state.recent.clear()
+        state.task = asyncio.create_task(self._wait_for_quiet(channel, state))
+        return True
+
+    async def close(self) -> None:
+        for state in self._channels.values():
+            if state.task is not None:
+                state.task.cancel()
+        self._channels.clear()
+
+    async def _wait_for_quiet(self, channel: discord.abc.Messageable, state: _ChannelBurst) -> None:
+        while (remaining := state.last + BURST_QUIET - time.monotonic()) > 0:
+            await asyncio.sleep(remaining)
+        state.active = False
+        state.task = None
+        duration = state.last - state.started
+        logger.info(
+            f"Spam burst ended in channel {channel.id}: {state.suppressed} messages over {duration:.0f}s"
+        )
+        try:
+            await self.on_end(channel, state.suppressed, duration)
+        except Exception:
+            logger.exception(f"Failed to report the end of a spam burst in {channel.id}")
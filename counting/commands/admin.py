@@ -26,6 +26,7 @@ SOFTWARE.
 import asyncio
 import re
 from enum import Enum
+from pathlib import Path
 from typing import Optional
 from datetime import datetime, timezone
 
@@ -35,8 +36,18 @@ from discord.utils import get
 from emoji import is_emoji
 from red_commons.logging import getLogger
 from redbot.core import commands
+from redbot.core.data_manager import cog_data_path
 from redbot.core.utils import chat_formatting as cf
-from redbot.core.utils.views import ConfirmView, SimpleMenu
+from redbot.core.utils.views import ConfirmView
+from tabulate import tabulate
+
+from ..archive import ArchiveError, detect_format
+from ..builder import LeaderboardBuild, catch_up, new_build_state
+from ..goals import MAX_GOAL_RULES, GoalRule
+from ..history import HISTORY_SIZE
+from ..metrics import metrics
+from ..templates import TemplateError, compile_template
+from ..utils import lazy_menu
 
 logger = getLogger("red.maxcogs.counting")
 
@@ -137,6 +148,19 @@ class AdminCommands(commands.Cog):
             f"Consecutive counting by the same user is now {toggle and 'disallowed' or 'allowed'}."
         )
 
+    @countingset_toggle.command(name="burstprotection")
+    async def set_burstprotection(self, ctx: commands.Context) -> None:
+        """
+        Toggle spam-burst protection.
+
+        When a flood of invalid messages hits the counting channel, they are removed in bulk
+        without a reply each, and a single summary is posted once the flood stops.
+        """
+        settings = await self.settings.get_guild_settings(ctx.guild)
+        toggle = not settings["toggle_burst_protection"]
+        await self.settings.update_guild(ctx.guild, "toggle_burst_protection", toggle)
+        await ctx.send(f"Spam-burst protection is now {toggle and 'enabled' or 'disabled'}.")
+
     @countingset_toggle.command(name="ruincount")
     async def set_ruincount(self, ctx: commands.Context) -> None:
         """Toggle whether users can ruin the count."""
@@ -220,17 +244,25 @@ class AdminCommands(commands.Cog):
                 MessageType.SAMEUSER: "default_same_user_message",
                 MessageType.RUIN_COUNT: "ruin_message",
             }[mtype]
-            await self.settings.update_guild(ctx.guild, key, message)
-            await ctx.send(f"Message for `{msg_type}` updated.")
         except ValueError:
-            await ctx.send(f"Invalid type. Use: {', '.join(mt.value for mt in MessageType)}.")
+            return await ctx.send(
+                f"Invalid type. Use: {', '.join(mt.value for mt in MessageType)}."
+            )
+        if key != "default_same_user_message":
+            try:
+                message = compile_template(key, message)
+            except TemplateError as e:
+                return await ctx.send(f"Invalid message: {e}")
+        await self.settings.update_guild(ctx.guild, key, message)
+        await ctx.send(f"Message for `{msg_type}` updated.")
 
     @countingset_messages.command(name="goalmessage")
     async def set_goal_message(self, ctx: commands.Context, *, message: str) -> None:
         """
         Set the message sent when the goal is reached.
 
-        Use `{user}` for the user and `{goal}` for the goal.
+        Use `{user}` for the user and `{goal}` for the goal. Numbers can be formatted, for
+        example `{goal:,}` shows 1,000,000.
 
         **Example usage**:
         - `[p]countingset messages goal {user} reached the goal of {goal}! Congratulations!`
@@ -241,7 +273,11 @@ class AdminCommands(commands.Cog):
         """
         if len(message) > 2000:
             return await ctx.send("Message is too long. Maximum length is 2000 characters.")
-        await self.settings.update_guild(ctx.guild, "goal_message", message)
+        try:
+            template = compile_template("goal_message", message)
+        except TemplateError as e:
+            return await ctx.send(f"Invalid message: {e}")
+        await self.settings.update_guild(ctx.guild, "goal_message", template)
         await ctx.send("Goal message updated.")
 
     @countingset_messages.command(name="progress")
@@ -259,7 +295,11 @@ class AdminCommands(commands.Cog):
         """
         if len(message) > 2000:
             return await ctx.send("Message is too long. Maximum length is 2000 characters.")
-        await self.settings.update_guild(ctx.guild, "progress_message", message)
+        try:
+            template = compile_template("progress_message", message)
+        except TemplateError as e:
+            return await ctx.send(f"Invalid message: {e}")
+        await self.settings.update_guild(ctx.guild, "progress_message", template)
         await ctx.send("Progress message updated.")
 
     @countingset.group(name="roles")
@@ -390,7 +430,7 @@ class AdminCommands(commands.Cog):
         - If `clear` is used, all goals will be removed.
         """
         settings = await self.settings.get_guild_settings(ctx.guild)
-        current_goals = settings.get("goals", [])
+        current_goals = settings["goals"]
 
         if action.lower() == "clear":
             await self.settings.update_guild(ctx.guild, "goals", [])
@@ -400,16 +440,15 @@ class AdminCommands(commands.Cog):
             return await ctx.send("Please provide a goal value.")
 
         if action.lower() == "add":
-            if goal not in current_goals:
-                current_goals.append(goal)
-                current_goals.sort()
+            if current_goals.add(goal):
                 await self.settings.update_guild(ctx.guild, "goals", current_goals)
-                await ctx.send(f"Counting goal {goal} added. Current goals: {', '.join(map(str, current_goals))}")
+                shown = ", ".join(map(str, current_goals[:10]))
+                more = f" and {cf.humanize_number(len(current_goals) - 10)} more" if len(current_goals) > 10 else ""
+                await ctx.send(f"Counting goal {goal} added. Current goals: {shown}{more}")
             else:
                 await ctx.send(f"Goal {goal} is already set.")
         elif action.lower() == "remove":
-            if goal in current_goals:
-                current_goals.remove(goal)
+            if current_goals.remove(goal):
                 await self.settings.update_guild(ctx.guild, "goals", current_goals)
                 await ctx.send(f"Counting goal {goal} removed.")
             else:
@@ -417,6 +456,76 @@ class AdminCommands(commands.Cog):
         else:
             await ctx.send("Invalid action. Use 'add', 'remove', or 'clear'.")
 
+    @countingset_limits.command(name="goalrule")
+    async def set_goal_rule(
+        self,
+        ctx: commands.Context,
+        action: str,
+        first: commands.Range[int, 1, 1000000000000000] = None,
+        second: commands.Range[int, 1, 1000000000000000] = None,
+    ) -> None:
+        """
+        Manage recurring goals.
+
+        Recurring goals are worked out as the count goes, so they never run out and are not
+        used up when reached. They work alongside the goals from `[p]countingset limits goal`.
+
+        **Example usage**:
+        - `[p]countingset limits goalrule every 1000` - 1000, 2000, 3000, ...
+        - `[p]countingset limits goalrule powers 10` - 10, 100, 1000, ...
+        - `[p]countingset limits goalrule sequence 500 1000` - 500, 1500, 2500, ...
+        - `[p]countingset limits goalrule list`
+        - `[p]countingset limits goalrule remove 2` - Remove the second rule in the list
+        - `[p]countingset limits goalrule clear`
+        """
+        settings = await self.settings.get_guild_settings(ctx.guild)
+        rules = list(settings["goal_rules"])
+        action = action.lower()
+
+        if action == "list":
+            if not rules:
+                return await ctx.send("No recurring goals set.")
+            return await ctx.send(
+                "\n".join(f"{i}. {rule.describe()}" for i, rule in enumerate(rules, start=1))
+            )
+        if action == "clear":
+            await self.settings.update_guild(ctx.guild, "goal_rules", [])
+            return await ctx.send("All recurring goals cleared.")
+        if action == "remove":
+            if first is None or not 1 <= first <= len(rules):
+                return await ctx.send(
+                    f"Give the number of the rule to remove, see `{ctx.clean_prefix}countingset limits goalrule list`."
+                )
+            removed = rules.pop(first - 1)
+            await self.settings.update_guild(ctx.guild, "goal_rules", rules)
+            return await ctx.send(f"Removed recurring goal: {removed.describe()}.")
+
+        if first is None:
+            return await ctx.send("Please provide a value for the rule.")
+        try:
+            if action == "every":
+                rule = GoalRule("sequence", first, first)
+            elif action == "powers":
+                rule = GoalRule("powers", first, first)
+            elif action == "sequence":
+                if second is None:
+                    return await ctx.send("Please provide both a start and a step.")
+                rule = GoalRule("sequence", first, second)
+            else:
+                return await ctx.send(
+                    "Invalid action. Use 'every', 'powers', 'sequence', 'list', 'remove', or 'clear'."
+                )
+        except ValueError as e:
+            return await ctx.send(str(e))
+
+        if rule in rules:
+            return await ctx.send("That recurring goal is already set.")
+        if len(rules) >= MAX_GOAL_RULES:
+            return await ctx.send(f"You can have at most {MAX_GOAL_RULES} recurring goals.")
+        rules.append(rule)
+        await self.settings.update_guild(ctx.guild, "goal_rules", rules)
+        await ctx.send(f"Recurring goal added: {rule.describe()}.")
+
     @countingset_limits.command(name="progressinterval")
     async def set_progress_interval(
         self, ctx: commands.Context, interval: commands.Range[int, 1, 100]
@@ -436,6 +545,28 @@ class AdminCommands(commands.Cog):
         await self.settings.update_guild(ctx.guild, "progress_interval", interval)
         await ctx.send(f"Progress messages will be sent every {interval} counts.")
 
+    @countingset_limits.command(name="rollbackwindow")
+    async def set_rollback_window(
+        self, ctx: commands.Context, counts: commands.Range[int, 0, HISTORY_SIZE]
+    ) -> None:
+        """
+        Set how many recent counts are rolled back when deleted
+
+        Deleting one of the last `<counts>` counts sets the count back to just before it.
+        Deleting an older count does nothing, so one deleted message can't undo a long run.
+
+        **Example usage**:
+        - `[p]countingset limits rollbackwindow 10`
+        - `[p]countingset limits rollbackwindow 0` - Never roll back deleted counts.
+
+        **Arguments**:
+        - `<counts>`: How many of the latest counts can be rolled back (0-100).
+        """
+        await self.settings.update_guild(ctx.guild, "rollback_window", counts)
+        if counts == 0:
+            return await ctx.send("Deleted counts will no longer be rolled back.")
+        await ctx.send(f"Deleting one of the last {counts} counts will roll the count back.")
+
     @countingset.group(name="reset")
     async def countingset_reset(self, ctx: commands.Context) -> None:
         """Manage reset actions for counting."""
@@ -533,7 +664,7 @@ class AdminCommands(commands.Cog):
         view.message = await ctx.send(embed=embed, view=view)
         await view.wait()
         if view.result:
-            await self.settings.update_guild(ctx.guild, "leaderboard", {})
+            await self.settings.replace_leaderboard(ctx.guild, {})
             await ctx.send("Leaderboard reset successfully.")
         else:
             await ctx.send("Reset cancelled.")
@@ -548,6 +679,9 @@ class AdminCommands(commands.Cog):
         It's lenient with historical data - it only counts consecutive number sequences and ignores
         interruptions from non-counting messages.
         
+        The scan runs in the background and saves its progress regularly. If it is interrupted
+        (for example by a restart), continue it with `[p]countingset misc buildresume`.
+        
         **Options**:
         - Use `merge` set to True to merge with existing leaderboard data
         - Default behavior replaces the current leaderboard entirely
@@ -555,24 +689,30 @@ class AdminCommands(commands.Cog):
         **Example usage**:
         - `[p]countingset misc buildleaderboard` - Replace leaderboard
         - `[p]countingset misc buildleaderboard true` - Merge with existing data
+        - `[p]countingset misc buildstatus` - Show progress of the current build
+        - `[p]countingset misc buildcancel` - Stop the build and discard its progress
         
         **Note**: This can take several minutes for channels with extensive history.
         """
+        if self._build_running(ctx.guild):
+            return await ctx.send(
+                f"A leaderboard build is already running. Check `{ctx.clean_prefix}countingset misc buildstatus`."
+            )
+        if await LeaderboardBuild.load_checkpoint(self.config, ctx.guild):
+            return await ctx.send(
+                "An unfinished leaderboard build was found. "
+                f"Use `{ctx.clean_prefix}countingset misc buildresume` to continue it or "
+                f"`{ctx.clean_prefix}countingset misc buildcancel` to discard it."
+            )
+        
         settings = await self.settings.get_guild_settings(ctx.guild)
         
         if not settings["channel"]:
             return await ctx.send("No counting channel is set. Use `[p]countingset channel` first.")
         
-        channel = ctx.guild.get_channel(settings["channel"])
-        if not channel:
-            return await ctx.send("The counting channel no longer exists.")
-        
-        if not isinstance(channel, discord.TextChannel):
-            return await ctx.send("The counting channel must be a text channel.")
-        
-        perms = channel.permissions_for(ctx.guild.me)
-        if not perms.read_message_history:
-            return await ctx.send(f"I need read message history permission in {channel.mention}.")
+        channel = await self._get_build_channel(ctx, settings["channel"])
+        if channel is None:
+            return
         
         view = ConfirmView(ctx.author, disable_buttons=True)
         action_text = "merge with" if merge else "replace"
@@ -586,156 +726,372 @@ class AdminCommands(commands.Cog):
         if not view.result:
             return await ctx.send("Leaderboard build cancelled.")
         
-        status_msg = await ctx.send("🔄 Starting leaderboard build... This may take a while.")
+        existing = settings.get("leaderboard", {}) if merge else {}
+        state = new_build_state(channel.id, merge, existing)
+        await self._start_build(ctx, LeaderboardBuild(self.config, ctx.guild, channel, state))
+
+    @countingset_misc.command(name="buildfromfile", aliases=["buildlbfile"])
+    @commands.bot_has_permissions(embed_links=True)
+    async def build_leaderboard_from_file(
+        self, ctx: commands.Context, merge: bool = False, path: Optional[str] = None
+    ) -> None:
+        """
+        Build the leaderboard from an exported message archive instead of the Discord API.
+        
+        Attach the export to the command message. Supported formats:
+        - DiscordChatExporter JSON exports of the counting channel
+        - NDJSON dumps with one message per line, oldest first, e.g.
+        `{"id": 123, "author_id": 456, "is_bot": false, "content": "42"}`
+        
+        The file is read as a stream, so very large exports are fine. The same lenient scanner
+        as `buildleaderboard` is used, and the build can be followed, resumed and cancelled
+        with the same commands.
+        
+        The bot owner may pass the `path` of an export already on the bot's machine instead
+        of attaching it.
+        
+        **Example usage**:
+        - `[p]countingset misc buildfromfile` - Replace leaderboard from the attached export
+        - `[p]countingset misc buildfromfile true` - Merge with existing data
+        """
+        if self._build_running(ctx.guild):
+            return await ctx.send(
+                f"A leaderboard build is already running. Check `{ctx.clean_prefix}countingset misc buildstatus`."
+            )
+        if await LeaderboardBuild.load_checkpoint(self.config, ctx.guild):
+            return await ctx.send(
+                "An unfinished leaderboard build was found. "
+                f"Use `{ctx.clean_prefix}countingset misc buildresume` to continue it or "
+                f"`{ctx.clean_prefix}countingset misc buildcancel` to discard it."
+            )
+        
+        settings = await self.settings.get_guild_settings(ctx.guild)
+        channel = ctx.guild.get_channel(settings["channel"]) if settings["channel"] else None
+        if channel is None:
+            return await ctx.send("No counting channel is set. Use `[p]countingset channel` first.")
+        
+        if path is not None:
+            if not await ctx.bot.is_owner(ctx.author):
+                return await ctx.send("Only the bot owner can build from a file path.")
+            archive_path, delete_archive = Path(path).expanduser(), False
+            if not archive_path.is_file():
+                return await ctx.send("That file does not exist.")
+        elif ctx.message.attachments:
+            attachment = ctx.message.attachments[0]
+            archive_path = cog_data_path(self) / "imports" / f"{ctx.guild.id}-{attachment.id}.json"
+            archive_path.parent.mkdir(parents=True, exist_ok=True)
+            async with ctx.typing():
+                await attachment.save(archive_path)
+            delete_archive = True
+        else:
+            return await ctx.send("Attach a DiscordChatExporter JSON or NDJSON export to the command.")
         
         try:
-            temp_leaderboard = {}
-            if merge:
-                existing = settings.get("leaderboard", {})
-                temp_leaderboard = {int(k): v for k, v in existing.items() if str(k).isdigit()}
-            
-            message_count = 0
-            valid_counts = 0
-            expected_next = 1
-            highest_count_found = 0
-            skipped_non_numeric = 0
-            last_user_id = None
-            
-            issues = {
-                "bot_messages": 0,
-                "same_user_violations": 0,
-                "out_of_sequence": 0
-            }
-            
-            async for message in channel.history(limit=None, oldest_first=True):
-                message_count += 1
-                
-                if message_count % 100 == 0:
-                    await status_msg.edit(
-                        content=f"🔄 Scanning messages... {cf.humanize_number(message_count)} processed, "
-                        f"{cf.humanize_number(valid_counts)} valid counts found (currently expecting: {expected_next})."
+            await asyncio.to_thread(detect_format, archive_path)
+        except (ArchiveError, OSError, UnicodeDecodeError) as e:
+            if delete_archive:
+                archive_path.unlink(missing_ok=True)
+            return await ctx.send(f"I can't read that file: {e}")
+        
+        view = ConfirmView(ctx.author, disable_buttons=True)
+        action_text = "merge with" if merge else "replace"
+        view.message = await ctx.send(
+            f"This will read the archive for {channel.mention} and {action_text} the current leaderboard. Continue?",
+            view=view
+        )
+        await view.wait()
+        
+        if not view.result:
+            if delete_archive:
+                archive_path.unlink(missing_ok=True)
+            return await ctx.send("Leaderboard build cancelled.")
+        
+        existing = settings.get("leaderboard", {}) if merge else {}
+        state = new_build_state(
+            channel.id,
+            merge,
+            existing,
+            archive_path=str(archive_path),
+            delete_archive=delete_archive,
+        )
+        await self._start_build(ctx, LeaderboardBuild(self.config, ctx.guild, channel, state))
+
+    @countingset_misc.command(name="buildresume")
+    @commands.bot_has_permissions(read_message_history=True, embed_links=True)
+    async def build_leaderboard_resume(self, ctx: commands.Context) -> None:
+        """Resume an unfinished leaderboard build from its last checkpoint."""
+        if self._build_running(ctx.guild):
+            return await ctx.send("A leaderboard build is already running.")
+        state = await LeaderboardBuild.load_checkpoint(self.config, ctx.guild)
+        if not state:
+            return await ctx.send("There is no unfinished leaderboard build to resume.")
+        if state.get("archive_path"):
+            channel = ctx.guild.get_channel(state["channel_id"])
+            if channel is None:
+                return await ctx.send("The counting channel no longer exists.")
+        else:
+            channel = await self._get_build_channel(ctx, state["channel_id"])
+            if channel is None:
+                return
+        await self._start_build(ctx, LeaderboardBuild(self.config, ctx.guild, channel, state))
+
+    @countingset_misc.command(name="buildstatus")
+    @commands.bot_has_permissions(embed_links=True)
+    async def build_leaderboard_status(self, ctx: commands.Context) -> None:
+        """Show the progress of the current or unfinished leaderboard build."""
+        job = self._build_jobs.get(ctx.guild.id)
+        if job is not None and job.running:
+            state, unique = job.state, len(job.leaderboard)
+            status = "🔄 Running"
+        else:
+            state = await LeaderboardBuild.load_checkpoint(self.config, ctx.guild)
+            if not state:
+                return await ctx.send("No leaderboard build is running or waiting to be resumed.")
+            unique = len(state["leaderboard"])
+            status = f"⏸️ Paused - use `{ctx.clean_prefix}countingset misc buildresume` to continue"
+        
+        channel = ctx.guild.get_channel(state["channel_id"])
+        checkpoint = (
+            f"<t:{int(state['checkpoint_at'])}:R>" if state["checkpoint_at"] else "Not yet saved"
+        )
+        embed = discord.Embed(title="Leaderboard Build Status", color=await ctx.embed_color())
+        embed.add_field(name="Status", value=status, inline=False)
+        embed.add_field(name="Channel", value=channel.mention if channel else "Deleted channel")
+        embed.add_field(name="Started", value=f"<t:{int(state['started_at'])}:R>")
+        embed.add_field(name="Last Checkpoint", value=checkpoint)
+        embed.add_field(name="Messages Scanned", value=cf.humanize_number(state["message_count"]))
+        embed.add_field(name="Valid Counts", value=cf.humanize_number(state["valid_counts"]))
+        embed.add_field(name="Unique Counters", value=cf.humanize_number(unique))
+        embed.add_field(name="Currently Expecting", value=cf.humanize_number(state["expected_next"]))
+        embed.set_footer(text=f"Action: {'Merge' if state['merge'] else 'Replace'} leaderboard data")
+        await ctx.send(embed=embed)
+
+    @countingset_misc.command(name="buildcancel")
+    async def build_leaderboard_cancel(self, ctx: commands.Context) -> None:
+        """Stop the current leaderboard build and discard its saved progress."""
+        job = self._build_jobs.pop(ctx.guild.id, None)
+        if job is not None:
+            await job.stop(discard=True)
+        elif await LeaderboardBuild.load_checkpoint(self.config, ctx.guild):
+            await self.config.guild(ctx.guild).build_checkpoint.clear()
+        else:
+            return await ctx.send("No leaderboard build is running or waiting to be resumed.")
+        await ctx.send("Leaderboard build cancelled and its progress discarded.")
+
+    @countingset_misc.command(name="catchup")
+    @commands.bot_has_permissions(read_message_history=True)
+    async def catch_up_leaderboard(self, ctx: commands.Context) -> None:
+        """
+        Catch up on counts posted while the bot was offline.
+        
+        Use this after the bot was offline, before counting carries on. Only messages newer than
+        the last one processed before the bot started are scanned, so it finishes in seconds
+        instead of re-reading the whole channel. Correct
+        counts that continue the current count are credited on the leaderboard and the count is
+        moved forward. New counts wait until the catch-up is finished.
+        
+        Up to 10,000 messages are scanned per run; run it again to continue if there were more.
+        """
+        settings = await self.settings.get_guild_settings(ctx.guild)
+        if not settings["channel"]:
+            return await ctx.send("No counting channel is set. Use `[p]countingset channel` first.")
+        after_id = settings["catchup_after_id"] or settings["last_message_id"]
+        if not after_id:
+            return await ctx.send(
+                "I haven't processed any messages in the counting channel yet. Use "
+                f"`{ctx.clean_prefix}countingset misc buildleaderboard` to scan the full history."
+            )
+        channel = await self._get_build_channel(ctx, settings["channel"])
+        if channel is None:
+            return
+        
+        async with ctx.typing():
+            async with self.event_handlers.sequencer(channel.id):
+                result = await catch_up(channel, after_id, settings["count"])
+                for user_id, credited in result["credits"].items():
+                    self.settings.increment_leaderboard(ctx.guild, user_id, credited)
+                if result["valid_counts"]:
+                    self.settings.update_guild_nowait(ctx.guild, "count", result["count"])
+                    self.settings.update_guild_nowait(
+                        ctx.guild, "last_user_id", result["last_user_id"]
                     )
-                
-                if message.author.bot:
-                    issues["bot_messages"] += 1
-                    continue
-                
-                if not message.content.strip().isdigit():
-                    skipped_non_numeric += 1
-                    continue
-                
-                count_value = int(message.content.strip())
-                
-                if count_value == expected_next:
-                    valid_counts += 1
-                    if count_value > highest_count_found:
-                        highest_count_found = count_value
-                    
-                    user_id = message.author.id
-                    temp_leaderboard[user_id] = temp_leaderboard.get(user_id, 0) + 1
-                    
-                    expected_next += 1
-                    last_user_id = user_id
-                    
-                elif count_value == 1:
-                    valid_counts += 1
-                    user_id = message.author.id
-                    temp_leaderboard[user_id] = temp_leaderboard.get(user_id, 0) + 1
-                    expected_next = 2
-                    last_user_id = user_id
-                else:
-                    issues["out_of_sequence"] += 1
-            
-            await self.settings.update_guild(ctx.guild, "leaderboard", temp_leaderboard)
-            
-            embed = discord.Embed(
-                title="✅ Leaderboard Build Complete",
-                color=discord.Color.green(),
-                timestamp=datetime.now(timezone.utc)
+                self.settings.update_guild_nowait(
+                    ctx.guild,
+                    "catchup_after_id",
+                    result["last_message_id"] if result["truncated"] else None,
+                )
+                if result["last_message_id"] > (settings["last_message_id"] or 0):
+                    self.settings.update_guild_nowait(
+                        ctx.guild, "last_message_id", result["last_message_id"]
+                    )
+        
+        msg = (
+            f"Caught up on {cf.humanize_number(result['message_count'])} messages: "
+            f"{cf.humanize_number(result['valid_counts'])} counts credited to "
+            f"{cf.humanize_number(len(result['credits']))} users, "
+            f"{cf.humanize_number(result['out_of_sequence'])} out of sequence. "
+            f"The count is now **{cf.humanize_number(result['count'])}**."
+        )
+        if result["truncated"]:
+            msg += "\nThere may be more messages to catch up on. Run this command again to continue."
+        await ctx.send(msg)
+
+    def _build_running(self, guild: discord.Guild) -> bool:
+        job = self._build_jobs.get(guild.id)
+        return job is not None and job.running
+
+    async def _get_build_channel(
+        self, ctx: commands.Context, channel_id: int
+    ) -> Optional[discord.TextChannel]:
+        """Return the channel to scan, or send why it can't be scanned and return None."""
+        channel = ctx.guild.get_channel(channel_id)
+        if not channel:
+            await ctx.send("The counting channel no longer exists.")
+            return None
+        
+        if not isinstance(channel, discord.TextChannel):
+            await ctx.send("The counting channel must be a text channel.")
+            return None
+        
+        perms = channel.permissions_for(ctx.guild.me)
+        if not perms.read_message_history:
+            await ctx.send(f"I need read message history permission in {channel.mention}.")
+            return None
+        return channel
+
+    async def _start_build(self, ctx: commands.Context, job: LeaderboardBuild) -> None:
+        """Run a leaderboard build in the background, reporting progress in ``ctx``."""
+        resumed = job.state["message_count"] > 0
+        status_msg = await ctx.send(
+            "🔄 Resuming leaderboard build from the last checkpoint..."
+            if resumed
+            else "🔄 Starting leaderboard build... This may take a while."
+        )
+        
+        async def on_progress(job: LeaderboardBuild) -> None:
+            state = job.state
+            eta = job.eta_seconds()
+            eta_text = (
+                f", about {cf.humanize_timedelta(seconds=max(int(eta), 1))} left"
+                if eta is not None
+                else ""
             )
+            await status_msg.edit(
+                content=f"🔄 Scanning messages... {cf.humanize_number(state['message_count'])} processed, "
+                f"{cf.humanize_number(state['valid_counts'])} valid counts found (currently expecting: {state['expected_next']}).\n"
+                f"{cf.humanize_number(int(job.messages_per_second()))} messages/sec{eta_text}."
+            )
+        
+        async def on_done(job: LeaderboardBuild, error: Optional[BaseException]) -> None:
+            self._build_jobs.pop(ctx.guild.id, None)
+            if isinstance(error, ArchiveError):
+                await status_msg.edit(content=f"❌ The leaderboard build was stopped: {error}")
+                return
+            if error is not None:
+                if isinstance(error, discord.HTTPException):
+                    content = f"❌ An error occurred while building the leaderboard: {str(error)}"
+                else:
+                    content = f"❌ An unexpected error occurred: {str(error)}"
+                await status_msg.edit(
+                    content=f"{content}\nProgress was saved. Use "
+                    f"`{ctx.clean_prefix}countingset misc buildresume` to continue."
+                )
+                return
+            await self.settings.replace_leaderboard(ctx.guild, job.leaderboard)
+            await status_msg.delete()
+            await ctx.send(embed=await self._build_summary_embed(ctx, job))
+        
+        self._build_jobs[ctx.guild.id] = job
+        job.start(on_progress, on_done)
+
+    async def _build_summary_embed(
+        self, ctx: commands.Context, job: LeaderboardBuild
+    ) -> discord.Embed:
+        settings = await self.settings.get_guild_settings(ctx.guild)
+        state = job.state
+        issues = state["issues"]
+        highest_count_found = state["highest_count_found"]
+        unique_counters = len(job.leaderboard)
+        
+        embed = discord.Embed(
+            title="✅ Leaderboard Build Complete",
+            color=discord.Color.green(),
+            timestamp=datetime.now(timezone.utc)
+        )
+        
+        embed.add_field(
+            name="📊 Statistics",
+            value=f"**Messages Scanned**: {cf.humanize_number(state['message_count'])}\n"
+                  f"**Bot Messages Skipped**: {cf.humanize_number(issues['bot_messages'])}\n"
+                  f"**Non-numeric Messages**: {cf.humanize_number(state['skipped_non_numeric'])}\n"
+                  f"**Out of Sequence**: {cf.humanize_number(issues['out_of_sequence'])}\n"
+                  f"**Valid Counts Found**: {cf.humanize_number(state['valid_counts'])}\n"
+                  f"**Highest Count Reached**: {cf.humanize_number(highest_count_found)}\n"
+                  f"**Unique Counters**: {cf.humanize_number(unique_counters)}",
+            inline=False
+        )
+        
+        if unique_counters:
+            sorted_lb = (await self.settings.get_leaderboard(ctx.guild)).top(5)
+            top_5_text = ""
+            for rank, (user_id, count) in enumerate(sorted_lb, 1):
+                member = ctx.guild.get_member(user_id)
+                name = member.display_name if member else f"User {user_id}"
+                top_5_text += f"**{rank}.** {name} - {cf.humanize_number(count)} counts\n"
             
             embed.add_field(
-                name="📊 Statistics",
-                value=f"**Messages Scanned**: {cf.humanize_number(message_count)}\n"
-                      f"**Bot Messages Skipped**: {cf.humanize_number(issues['bot_messages'])}\n"
-                      f"**Non-numeric Messages**: {cf.humanize_number(skipped_non_numeric)}\n"
-                      f"**Out of Sequence**: {cf.humanize_number(issues['out_of_sequence'])}\n"
-                      f"**Valid Counts Found**: {cf.humanize_number(valid_counts)}\n"
-                      f"**Highest Count Reached**: {cf.humanize_number(highest_count_found)}\n"
-                      f"**Unique Counters**: {cf.humanize_number(len(temp_leaderboard))}",
+                name="🏆 Top 5 Counters",
+                value=top_5_text,
                 inline=False
             )
-            
-            if temp_leaderboard:
-                sorted_lb = sorted(temp_leaderboard.items(), key=lambda x: x[1], reverse=True)[:5]
-                top_5_text = ""
-                for rank, (user_id, count) in enumerate(sorted_lb, 1):
-                    member = ctx.guild.get_member(user_id)
-                    name = member.display_name if member else f"User {user_id}"
-                    top_5_text += f"**{rank}.** {name} - {cf.humanize_number(count)} counts\n"
-                
-                embed.add_field(
-                    name="🏆 Top 5 Counters",
-                    value=top_5_text,
-                    inline=False
-                )
-            
-            current_count = settings.get("count", 0)
+        
+        current_count = settings.get("count", 0)
+        embed.add_field(
+            name="ℹ️ Current Count Status",
+            value=f"**Current Count**: {cf.humanize_number(current_count)}\n"
+                  f"**Highest Found**: {cf.humanize_number(highest_count_found)}\n"
+                  f"{'✅ Counts match!' if current_count == highest_count_found else '⚠️ Mismatch detected'}",
+            inline=False
+        )
+        
+        embed.add_field(
+            name="ℹ️ How Scanning Works",
+            value="This scanner uses **lenient mode** for historical data:\n"
+                  "• Counts consecutive numbers starting from 1\n"
+                  "• Treats any '1' as a potential sequence restart\n"
+                  "• Skips bot messages and non-numeric content\n"
+                  "• Ignores same-user restrictions for historical data\n"
+                  "• Credits all users who posted valid sequence numbers",
+            inline=False
+        )
+        
+        if current_count != highest_count_found:
             embed.add_field(
-                name="ℹ️ Current Count Status",
-                value=f"**Current Count**: {cf.humanize_number(current_count)}\n"
-                      f"**Highest Found**: {cf.humanize_number(highest_count_found)}\n"
-                      f"{'✅ Counts match!' if current_count == highest_count_found else '⚠️ Mismatch detected'}",
+                name="⚠️ Count Mismatch",
+                value=f"The current count ({cf.humanize_number(current_count)}) doesn't match "
+                      f"the highest valid count found ({cf.humanize_number(highest_count_found)}).\n\n"
+                      f"**Possible reasons:**\n"
+                      f"• Count was manually adjusted\n"
+                      f"• Messages were deleted after being counted\n"
+                      f"• Count continued from wrong number after a ruin\n\n"
+                      f"If you trust the scan results, you can update the count:\n"
+                      f"`{ctx.clean_prefix}countingset reset setcount {highest_count_found}`",
                 inline=False
             )
-            
+        
+        if issues["out_of_sequence"] > 0:
             embed.add_field(
-                name="ℹ️ How Scanning Works",
-                value="This scanner uses **lenient mode** for historical data:\n"
-                      "• Counts consecutive numbers starting from 1\n"
-                      "• Treats any '1' as a potential sequence restart\n"
-                      "• Skips bot messages and non-numeric content\n"
-                      "• Ignores same-user restrictions for historical data\n"
-                      "• Credits all users who posted valid sequence numbers",
+                name="❓ Why Were Messages Skipped?",
+                value=f"**{cf.humanize_number(issues['out_of_sequence'])} out-of-sequence messages** were found. These are numbers that:\n"
+                      f"• Don't follow the expected sequence\n"
+                      f"• Were posted after the count was ruined but before someone posted '1'\n"
+                      f"• Represent duplicate or incorrect counts\n\n"
+                      f"This is normal in active counting channels where ruins occur.",
                 inline=False
             )
-            
-            if current_count != highest_count_found:
-                embed.add_field(
-                    name="⚠️ Count Mismatch",
-                    value=f"The current count ({cf.humanize_number(current_count)}) doesn't match "
-                          f"the highest valid count found ({cf.humanize_number(highest_count_found)}).\n\n"
-                          f"**Possible reasons:**\n"
-                          f"• Count was manually adjusted\n"
-                          f"• Messages were deleted after being counted\n"
-                          f"• Count continued from wrong number after a ruin\n\n"
-                          f"If you trust the scan results, you can update the count:\n"
-                          f"`{ctx.clean_prefix}countingset reset setcount {highest_count_found}`",
-                    inline=False
-                )
-            
-            if issues["out_of_sequence"] > 0:
-                embed.add_field(
-                    name="❓ Why Were Messages Skipped?",
-                    value=f"**{cf.humanize_number(issues['out_of_sequence'])} out-of-sequence messages** were found. These are numbers that:\n"
-                          f"• Don't follow the expected sequence\n"
-                          f"• Were posted after the count was ruined but before someone posted '1'\n"
-                          f"• Represent duplicate or incorrect counts\n\n"
-                          f"This is normal in active counting channels where ruins occur.",
-                    inline=False
-                )
-            
-            embed.set_footer(text=f"Action: {'Merged' if merge else 'Replaced'} leaderboard data")
-            
-            await status_msg.delete()
-            await ctx.send(embed=embed)
-            
-        except discord.HTTPException as e:
-            logger.error(f"Failed to build leaderboard in guild {ctx.guild.id}: {e}")
-            await status_msg.edit(content=f"❌ An error occurred while building the leaderboard: {str(e)}")
-        except Exception as e:
-            logger.error(f"Unexpected error building leaderboard in guild {ctx.guild.id}: {e}", exc_info=True)
-            await status_msg.edit(content=f"❌ An unexpected error occurred: {str(e)}")
+        
+        embed.set_footer(text=f"Action: {'Merged' if state['merge'] else 'Replaced'} leaderboard data")
+        return embed
 
     @countingset_misc.command(name="emoji", aliases=["setemoji"])
     async def set_emoji(self, ctx: commands.Context, emoji_input: str) -> None:
@@ -792,6 +1148,122 @@ class AdminCommands(commands.Cog):
                 exc_info=True,
             )
 
+    @countingset.group(name="owner")
+    @commands.is_owner()
+    async def countingset_owner(self, ctx: commands.Context) -> None:
+        """Bot owner settings for the counting cog."""
+
+    @countingset_owner.command(name="writebehind")
+    async def set_write_behind(
+        self,
+        ctx: commands.Context,
+        interval: commands.Range[float, 0, 300],
+        threshold: commands.Range[int, 1, 10000] = 100,
+    ) -> None:
+        """
+        Configure how often cached count data is flushed to storage.
+
+        Counts, last counters and leaderboard entries are written in batches. A flush happens
+        every `<interval>` seconds, or sooner once `<threshold>` keys are waiting.
+        Set the interval to 0 to write every change immediately.
+        Everything pending is always flushed when the cog unloads.
+
+        **Example usage**:
+        - `[p]countingset owner writebehind 5 100`
+        - `[p]countingset owner writebehind 0`
+
+        **Arguments**:
+        - `<interval>`: Seconds between flushes (0-300).
+        - `<threshold>`: Number of pending keys that forces an early flush (1-10000).
+        """
+        await self.config.write_behind_interval.set(interval)
+        await self.config.write_behind_threshold.set(threshold)
+        self.settings.configure_write_behind(interval, threshold)
+        if interval == 0:
+            return await ctx.send("Write-behind disabled. Changes are written immediately.")
+        await ctx.send(
+            f"Pending changes will be flushed every {interval} seconds "
+            f"or once {cf.humanize_number(threshold)} keys are waiting."
+        )
+
+    @countingset_owner.command(name="guildcache")
+    async def set_guild_cache(
+        self,
+        ctx: commands.Context,
+        max_guilds: commands.Range[int, 10, 100000],
+        warm_up: Optional[bool] = None,
+    ) -> None:
+        """
+        Configure how many guilds' counting settings are kept in memory.
+
+        Guilds are loaded the first time they are used. Once more than `<max_guilds>` are
+        cached, the least recently used guilds that have been idle for a while and have no
+        unsaved changes are dropped from memory.
+        With `[warm_up]` enabled, guilds with an active counting channel are loaded when the
+        cog starts so their first count doesn't wait on storage.
+
+        **Example usage**:
+        - `[p]countingset owner guildcache 1000`
+        - `[p]countingset owner guildcache 500 false`
+
+        **Arguments**:
+        - `<max_guilds>`: Number of guilds to keep cached (10-100000).
+        - `[warm_up]`: Whether to load active guilds at startup.
+        """
+        await self.config.cache_max_guilds.set(max_guilds)
+        if warm_up is not None:
+            await self.config.warm_up_active_guilds.set(warm_up)
+        else:
+            warm_up = await self.config.warm_up_active_guilds()
+        self.settings.configure_cache(max_guilds)
+        await ctx.send(
+            f"Up to {cf.humanize_number(max_guilds)} guilds will be kept in memory. "
+            f"Active guilds are {'loaded' if warm_up else 'not loaded'} at startup."
+        )
+
+    @countingset_owner.command(name="latency")
+    async def show_latency(self, ctx: commands.Context, reset: bool = False) -> None:
+        """
+        Show latency histograms for the counting hot path.
+
+        - `handler.*`: Total time spent handling a message, edit or delete in a counting channel.
+        - `queue_wait`: Time spent waiting for earlier messages in the same channel.
+        - `config.write`: Time spent writing to storage.
+        - `api.*`: Time spent on Discord API calls.
+
+        Percentiles are upper bounds taken from the histogram buckets.
+
+        **Example usage**:
+        - `[p]countingset owner latency`
+        - `[p]countingset owner latency true` - Show, then start over
+        """
+        if not metrics.histograms:
+            return await ctx.send("No latency has been recorded yet.")
+        
+        rows = [
+            [
+                name,
+                cf.humanize_number(h.count),
+                f"{h.mean:.1f}",
+                f"{h.percentile(50):.0f}",
+                f"{h.percentile(95):.0f}",
+                f"{h.percentile(99):.0f}",
+                f"{h.max:.0f}",
+            ]
+            for name, h in sorted(metrics.histograms.items())
+        ]
+        table = tabulate(
+            rows,
+            headers=["Metric", "Count", "Mean", "p50", "p95", "p99", "Max"],
+            tablefmt="simple",
+            stralign="left",
+        )
+        await ctx.send(
+            f"Latency in milliseconds since <t:{int(metrics.since)}:R>:\n{cf.box(table, lang='prolog')}"
+        )
+        if reset:
+            metrics.reset()
+
     @countingset.command(name="settings")
     @commands.bot_has_permissions(embed_links=True)
     async def set_settings(self, ctx: commands.Context) -> None:
@@ -820,6 +1292,7 @@ class AdminCommands(commands.Cog):
                 f"{settings['min_account_age']} days{' (disabled)' if settings['min_account_age'] == 0 else ''}",
             ),
             ("Allow Ruin", bool_to_status(settings["allow_ruin"])),
+            ("Burst Protection", bool_to_status(settings["toggle_burst_protection"])),
             ("Ruin Role", role.mention if role else "Not set"),
             (
                 "Ruin Role Duration",
@@ -847,6 +1320,7 @@ class AdminCommands(commands.Cog):
             ("Toggle Goal Delete", bool_to_status(settings["toggle_goal_delete"])),
             ("Toggle Progress Delete", bool_to_status(settings["toggle_progress_delete"])),
             ("Progress Interval", f"{settings['progress_interval']} counts"),
+            ("Rollback Window", f"{settings['rollback_window']} counts"),
             ("Progress Messages", bool_to_status(settings["toggle_progress"])),
             (
                 "Messages",
@@ -876,23 +1350,30 @@ class AdminCommands(commands.Cog):
         This will show all counting goals set for the server.
         """
         settings = await self.settings.get_guild_settings(ctx.guild)
-        goals = settings.get("goals", [])
+        goals = settings["goals"]
+        rules = "\n".join(rule.describe() for rule in goals.rules)
 
         if not goals:
             return await ctx.send("No counting goals set.")
+        if not len(goals):
+            return await ctx.send(f"Recurring goals:\n{rules}")
 
-        embeds = []
         goals_per_page = 10
-        for i in range(0, len(goals), goals_per_page):
-            page_goals = goals[i : i + goals_per_page]
-            goal_list = "\n".join(str(goal) for goal in page_goals)
+        page_count = (len(goals) + goals_per_page - 1) // goals_per_page
+        color = await ctx.embed_color()
+
+        async def render(page_number: int) -> discord.Embed:
+            i = page_number * goals_per_page
             embed = discord.Embed(
                 title="Current Counting Goals",
-                description=goal_list,
-                color=await ctx.embed_color(),
+                description="\n".join(str(goal) for goal in goals[i : i + goals_per_page]),
+                color=color,
             )
+            if rules:
+                embed.add_field(name="Recurring Goals", value=rules, inline=False)
             embed.set_footer(
-                text=f"Page {i // goals_per_page + 1}/{len(goals) // goals_per_page + 1} | Total goals: {len(goals)}"
+                text=f"Page {page_number + 1}/{page_count} | Total goals: {cf.humanize_number(len(goals))}"
             )
-            embeds.append(embed)
-        await SimpleMenu(pages=embeds, disable_after_timeout=True, timeout=120).start(ctx)
+            return embed
+
+        await lazy_menu(render, page_count).start(ctx)
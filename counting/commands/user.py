@@ -23,7 +23,7 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import asyncio
+import time
 from datetime import datetime
 from typing import Optional
 
@@ -31,9 +31,15 @@ import discord
 from redbot.core import commands
 from redbot.core.utils import chat_formatting as cf
 from redbot.core.utils.chat_formatting import box
-from redbot.core.utils.views import ConfirmView, SimpleMenu
+from redbot.core.utils.views import ConfirmView
 from tabulate import tabulate
 
+from ..utils import lazy_menu
+
+LEADERBOARD_PAGE_SIZE = 15
+# How long a rendered leaderboard page may be reused.
+LEADERBOARD_PAGE_TTL = 60
+
 
 class UserCommands(commands.Cog):
     @commands.hybrid_group()
@@ -49,17 +55,14 @@ class UserCommands(commands.Cog):
         if user.bot:
             return await ctx.send("Bots cannot count.")
         
-        guild_settings = await self.settings.get_guild_settings(ctx.guild)
-        leaderboard = guild_settings.get("leaderboard", {})
+        leaderboard = await self.settings.get_leaderboard(ctx.guild)
         
-        user_count = leaderboard.get(user.id, 0)
+        user_count = leaderboard.count_of(user.id)
         
         if user_count == 0:
             return await ctx.send(f"{user.display_name} has not counted yet in this server.")
         
-        # Calculate rank
-        sorted_leaderboard = sorted(leaderboard.items(), key=lambda x: x[1], reverse=True)
-        rank = next((i + 1 for i, (uid, _) in enumerate(sorted_leaderboard) if uid == user.id), None)
+        rank = leaderboard.rank_of(user.id)
         
         table = tabulate(
             [
@@ -96,8 +99,7 @@ class UserCommands(commands.Cog):
         await view.wait()
         
         if view.result:
-            leaderboard[ctx.author.id] = 0
-            await self.settings.update_guild(ctx.guild, "leaderboard", leaderboard)
+            self.settings.set_leaderboard_entry(ctx.guild, ctx.author.id, 0)
             await ctx.send("Your server counting stats have been reset.")
         else:
             await ctx.send("Reset cancelled.")
@@ -112,42 +114,58 @@ class UserCommands(commands.Cog):
         Displays the top users with the highest counts, paginated by 15.
         """
         settings = await self.settings.get_guild_settings(ctx.guild)
-        leaderboard = settings.get("leaderboard", {})
-
-        if not leaderboard:
+        if not settings.get("leaderboard"):
             return await ctx.send(
                 "No counts recorded yet. Get counting!\n\n"
                 f"If you've been counting before this leaderboard was set up, an admin can use:\n"
                 f"`{ctx.clean_prefix}countingset misc buildleaderboard` to scan message history."
             )
 
-        filtered_leaderboard = {}
-        for key, count in leaderboard.items():
-            if count == 0:
-                continue
-            if isinstance(key, int):
-                filtered_leaderboard[key] = count
-            elif isinstance(key, str) and key.isdigit():
-                filtered_leaderboard[int(key)] = count
-
-        if not filtered_leaderboard:
+        leaderboard = await self.settings.get_leaderboard(ctx.guild)
+        if not len(leaderboard):
             return await ctx.send("No counts recorded yet. Get counting!")
 
-        sorted_items = sorted(filtered_leaderboard.items(), key=lambda x: x[1], reverse=True)
-        
-        display_names = await self._build_display_names(ctx, [uid for uid, _ in sorted_items])
-
-        pages = []
-        page_size = 15
-        for i in range(0, len(sorted_items), page_size):
-            page_items = sorted_items[i : i + page_size]
+        color = await ctx.embed_color()
+
+        async def render(page_number: int) -> discord.Embed:
+            return await self._render_leaderboard_page(ctx, page_number, color)
+
+        page_count = leaderboard.page_count(LEADERBOARD_PAGE_SIZE)
+        await lazy_menu(render, page_count).start(ctx)
+
+    async def _render_leaderboard_page(
+        self, ctx: commands.Context, page_number: int, color: discord.Color
+    ) -> discord.Embed:
+        """Build one leaderboard page, reusing the cached table while the leaderboard is unchanged."""
+        leaderboard = await self.settings.get_leaderboard(ctx.guild)
+        total_pages = max(leaderboard.page_count(LEADERBOARD_PAGE_SIZE), 1)
+        page_number = min(page_number, total_pages - 1)
+
+        now = time.monotonic()
+        cached = self._leaderboard_pages.get(ctx.guild.id)
+        if (
+            cached is None
+            or cached[0] is not leaderboard
+            or cached[1] != leaderboard.version
+            or cached[2] <= now
+        ):
+            cached = (leaderboard, leaderboard.version, now + LEADERBOARD_PAGE_TTL, {})
+            self._leaderboard_pages[ctx.guild.id] = cached
+        pages = cached[3]
+
+        description = pages.get(page_number)
+        if description is None:
+            page_items = leaderboard.page(page_number, LEADERBOARD_PAGE_SIZE)
+            display_names = await self._build_display_names(ctx, [uid for uid, _ in page_items])
             table_data = [
                 [
                     str(pos),
-                    display_names.get(user_id, f"Unknown User"),
+                    display_names.get(user_id, "Unknown User"),
                     cf.humanize_number(count),
                 ]
-                for pos, (user_id, count) in enumerate(page_items, start=i + 1)
+                for pos, (user_id, count) in enumerate(
+                    page_items, start=page_number * LEADERBOARD_PAGE_SIZE + 1
+                )
             ]
             table = tabulate(
                 table_data,
@@ -155,37 +173,35 @@ class UserCommands(commands.Cog):
                 tablefmt="simple",
                 stralign="left",
             )
-            page_num = (i // page_size) + 1
-            total_pages = (len(sorted_items) + page_size - 1) // page_size
-            embed = discord.Embed(
-                title=f"🏆 Counting Leaderboard - Page {page_num}/{total_pages}",
-                description=box(table, lang="prolog"),
-                color=await ctx.embed_color(),
-            )
-            embed.set_footer(text=f"Total counters: {len(filtered_leaderboard)}")
-            pages.append(embed)
+            description = pages[page_number] = box(table, lang="prolog")
 
-        await SimpleMenu(pages, disable_after_timeout=True, timeout=120).start(ctx)
+        embed = discord.Embed(
+            title=f"🏆 Counting Leaderboard - Page {page_number + 1}/{total_pages}",
+            description=description,
+            color=color,
+        )
+        embed.set_footer(text=f"Total counters: {len(leaderboard)}")
+        return embed
 
     async def _build_display_names(self, ctx: commands.Context, user_ids: list[int]) -> dict:
         """
         Efficiently build a mapping of user_id to display_name.
 
-        Prioritizes guild members, then parallel-fetches missing users via API.
+        Prioritizes guild members, then resolves the rest through the shared name resolver.
         """
         display_names = {}
-        
-        member_map = {m.id: m.display_name for m in ctx.guild.members if m.id in set(user_ids)}
-        display_names.update(member_map)
-        
-        missing_ids = [uid for uid in user_ids if uid not in member_map]
-        
+        missing_ids = []
+
+        for uid in user_ids:
+            member = ctx.guild.get_member(uid)
+            if member is not None:
+                display_names[uid] = member.display_name
+            else:
+                missing_ids.append(uid)
+
         if missing_ids:
-            fetch_tasks = [self.bot.fetch_user(uid) for uid in missing_ids]
-            fetched_results = await asyncio.gather(*fetch_tasks, return_exceptions=True)
-
-            for result, uid in zip(fetched_results, missing_ids):
-                if isinstance(result, (discord.User, discord.Member)):
-                    display_names[uid] = result.display_name
-                else:
-                    display_names[uid] = f"Unknown User"
+            resolved = await self.name_resolver.resolve(missing_ids)
+            for uid in missing_ids:
+                display_names[uid] = resolved.get(uid) or "Unknown User"
+
+        return display_names
@@ -23,16 +23,20 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from typing import Any, Dict, Final, Optional
+import copy
+from typing import Any, Dict, Final, Optional, Tuple
 
 import discord
 from redbot.core import Config, commands
 from redbot.core.bot import Red
 
+from .builder import LeaderboardBuild
 from .commands.admin import AdminCommands
 from .commands.user import UserCommands
 from .event_handlers import EventHandlers
-from .settings import SettingsManager
+from .metrics import metrics
+from .resolver import UserNameResolver
+from .settings import DEFAULT_GLOBAL, DEFAULT_GUILD, DEFAULT_USER, SettingsManager
 
 
 class Counting(UserCommands, AdminCommands, commands.Cog):
@@ -46,46 +50,18 @@ class Counting(UserCommands, AdminCommands, commands.Cog):
         self.bot = bot
         self.config = Config.get_conf(self, identifier=9008567, force_registration=True)
         self.settings = SettingsManager(self.config)
-        self._default_guild: Dict[str, Any] = {
-            "count": 0,
-            "channel": None,
-            "toggle": False,
-            "delete_after": 10,
-            "toggle_delete_after": False,
-            "default_edit_message": "You can't edit your messages here. Next number: {next_count}",
-            "default_next_number_message": "Next number should be {next_count}.",
-            "default_same_user_message": "You cannot count consecutively. Wait for someone else.",
-            "toggle_edit_message": False,
-            "toggle_next_number_message": False,
-            "same_user_to_count": False,
-            "last_user_id": None,
-            "toggle_reactions": False,
-            "default_reaction": "✅",
-            "use_silent": False,
-            "min_account_age": 0,
-            "allow_ruin": False,
-            "ruin_role_id": None,
-            "ruin_message": "{user} ruined the count at {count}! Starting back at 1.",
-            "temp_roles": {},
-            "ruin_role_duration": None,
-            "excluded_roles": [],
-            "goals": [],
-            "goal_message": "{user} reached the goal of {goal}! Congratulations!",
-            "toggle_goal_delete": False,
-            "progress_interval": 10,
-            "progress_message": "{remaining} counts left to reach the goal of {goal}!",
-            "toggle_progress_delete": False,
-            "toggle_progress": False,
-            "reset_roles": [],
-            "leaderboard": {},
-            "toggle_reset_leaderboard_on_ruin": False,
-        }
-        self._default_user: Dict[str, Any] = {
-            "count": 0,
-            "last_count_timestamp": None,
-        }
+        self._leaderboard_pages: Dict[int, Tuple[Any, int, float, Dict[int, str]]] = {}
+        self.name_resolver = UserNameResolver(bot)
+        # Other cogs can forward latency samples with ``cog.metrics.add_hook``.
+        self.metrics = metrics
+        self._build_jobs: Dict[int, LeaderboardBuild] = {}
+        # Copies, so nothing done to one instance's defaults reaches the shared constants.
+        self._default_guild: Dict[str, Any] = copy.deepcopy(dict(DEFAULT_GUILD))
+        self._default_user: Dict[str, Any] = copy.deepcopy(dict(DEFAULT_USER))
+        self._default_global: Dict[str, Any] = copy.deepcopy(dict(DEFAULT_GLOBAL))
         self.config.register_guild(**self._default_guild)
         self.config.register_user(**self._default_user)
+        self.config.register_global(**self._default_global)
         self.bot.loop.create_task(self.settings.initialize())
         self.event_handlers = EventHandlers(bot, self.settings)
 
@@ -105,24 +81,20 @@ class Counting(UserCommands, AdminCommands, commands.Cog):
         await self.config.user_from_id(user_id).clear()
         
         all_guilds = await self.config.all_guilds()
-        for guild_id, guild_data in all_guilds.items():
-            leaderboard = guild_data.get("leaderboard", {})
-            if user_id in leaderboard:
-                del leaderboard[user_id]
-                await self.config.guild_from_id(guild_id).leaderboard.set(leaderboard)
+        for guild_id in set(all_guilds) | set(self.settings._guild_cache):
+            await self.settings.delete_leaderboard_entry(guild_id, user_id)
                 
-        if hasattr(self.settings, '_guild_cache'):
-            for guild_id in self.settings._guild_cache:
-                if "leaderboard" in self.settings._guild_cache[guild_id]:
-                    leaderboard = self.settings._guild_cache[guild_id]["leaderboard"]
-                    if user_id in leaderboard:
-                        del leaderboard[user_id]
-                        
         if hasattr(self.settings, '_user_cache') and user_id in self.settings._user_cache:
             del self.settings._user_cache[user_id]
 
-    def cog_unload(self):
-        self.event_handlers.remove_expired_roles.cancel()
+    async def cog_unload(self) -> None:
+        self.event_handlers.role_expiry.stop()
+        for job in list(self._build_jobs.values()):
+            # Keeps the checkpoint so the build can be resumed after reload.
+            await job.stop()
+        await self.event_handlers.bursts.close()
+        await self.event_handlers.actions.close()
+        await self.settings.close()
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message) -> None:
@@ -133,5 +105,9 @@ class Counting(UserCommands, AdminCommands, commands.Cog):
         await self.event_handlers.on_raw_message_edit(payload)
 
     @commands.Cog.listener()
-    async def on_message_delete(self, message: discord.Message) -> None:
-        await self.event_handlers.on_message_delete(message)
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent) -> None:
+        await self.event_handlers.on_raw_message_delete(payload)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent) -> None:
+        await self.event_handlers.on_raw_bulk_message_delete(payload)
@@ -24,19 +24,23 @@ SOFTWARE.
 """
 
 import asyncio
+import time
+import weakref
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, Awaitable, Dict, Iterable, Optional
 
 import discord
-from discord.ext import tasks
 from red_commons.logging import getLogger
 
+from .actions import ActionQueue
+from .burst import BurstGuard
+from .expiry import RoleExpiryScheduler
+from .history import CountHistory
+from .metrics import metrics
 from .settings import SettingsManager
 from .utils import (
-    add_reaction,
     assign_ruin_role,
     handle_invalid_count,
-    remove_expired_roles,
     send_message,
 )
 
@@ -49,22 +53,22 @@ class EventHandlers:
     def __init__(self, bot, settings: SettingsManager):
         self.bot = bot
         self.settings = settings
-        self.remove_expired_roles = tasks.loop(minutes=1)(self._remove_expired_roles)
-        self.remove_expired_roles.before_loop(self._before_remove_expired_roles)
-        self.remove_expired_roles.start()
-
-    async def _remove_expired_roles(self):
-        for guild in self.bot.guilds:
-            await remove_expired_roles(self.settings.config, guild)
-
-    async def _before_remove_expired_roles(self):
-        await self.bot.wait_until_ready()
+        self._channel_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = (
+            weakref.WeakValueDictionary()
+        )
+        self.actions = ActionQueue()
+        self.bursts = BurstGuard(self._announce_burst_end)
+        self.role_expiry = RoleExpiryScheduler(bot, settings.config)
+        self.role_expiry.start()
+        self._histories: Dict[int, CountHistory] = {}
+        # The count each flooded channel was at when a suppressed message ruined it.
+        self._burst_ruins: Dict[int, int] = {}
 
     async def _handle_goal_reached(
         self, message: discord.Message, settings: dict[str, Any], reached_goal: int
     ) -> None:
         try:
-            response = settings["goal_message"].format(
+            response = settings["goal_message"].render(
                 user=message.author.mention,
                 goal=reached_goal,
                 count=reached_goal,
@@ -78,136 +82,199 @@ class EventHandlers:
                 delete_after=delete_after,
                 silent=settings["use_silent"],
             )
-            goals = settings.get("goals", [])
-            if reached_goal in goals:
-                goals.remove(reached_goal)
+            goals = settings["goals"]
+            if goals.remove(reached_goal):
                 await self.settings.update_guild(message.guild, "goals", goals)
-        except KeyError as e:
-            logger.error(
-                f"Failed to format goal message in guild {message.guild.id}: Invalid placeholder {e}"
-            )
-            await send_message(
-                message.channel,
-                f"{message.author.mention} reached the goal of {reached_goal}! But the goal message is misconfigured.",
-                delete_after=(
-                    settings["delete_after"] if settings.get("toggle_goal_delete", False) else None
-                ),
-                silent=settings["use_silent"],
-            )
         except discord.HTTPException as e:
             logger.error(f"Failed to send goal message in guild {message.guild.id}: {e}")
 
+    def sequencer(self, channel_id: int) -> asyncio.Lock:
+        """
+        Return the lock that serializes count processing for a channel.
+
+        ``asyncio.Lock`` wakes waiters in FIFO order and ``on_message`` takes it before its
+        first await, so counts are applied strictly in the order Discord delivered them.
+        """
+        lock = self._channel_locks.get(channel_id)
+        if lock is None:
+            lock = self._channel_locks[channel_id] = asyncio.Lock()
+        return lock
+
     async def on_message(self, message: discord.Message) -> None:
-        if message.author.bot or not message.guild:
+        if (
+            message.author.bot
+            or not message.guild
+            or not self.settings.is_counting_channel(message.channel.id)
+        ):
             return
+        with metrics.timer("handler.message"):
+            queued = time.perf_counter()
+            async with self.sequencer(message.channel.id):
+                metrics.observe("queue_wait", time.perf_counter() - queued)
+                followup = await self._process_message(message)
+            if followup is not None:
+                await followup
+
+    async def _process_message(self, message: discord.Message) -> Optional[Awaitable[None]]:
+        """
+        Validate a message and apply its effect on the count.
+
+        State changes are made synchronously in the settings cache while the channel is
+        locked; Discord side effects are returned as an awaitable to run after release.
+        """
         if await self.bot.cog_disabled_in_guild(self.bot.get_cog("Counting"), message.guild):
-            return
+            return None
         
         settings = await self.settings.get_guild_settings(message.guild)
         
         if not settings["toggle"] or message.channel.id != settings["channel"]:
-            return
+            return None
         
         perms = message.channel.permissions_for(message.guild.me)
         if not (perms.send_messages and perms.manage_messages):
             logger.warning(f"Missing permissions in {message.channel.id}")
-            return
+            return None
+        
+        # Becomes the catch-up starting point when the guild is first loaded after a restart.
+        self.settings.update_guild_nowait(message.guild, "last_message_id", message.id)
         
         if settings["min_account_age"]:
             account_age = (datetime.now(timezone.utc) - message.author.created_at).days
             if account_age < settings["min_account_age"]:
-                await handle_invalid_count(
+                return self._reject_count(
                     message,
                     f"Account must be at least {settings['min_account_age']} days old to count.",
                     settings,
                 )
-                return
         
         if settings["same_user_to_count"] and settings["last_user_id"] == message.author.id:
-            await handle_invalid_count(message, settings["default_same_user_message"], settings)
-            return
+            return self._reject_count(message, settings["default_same_user_message"], settings)
         
         expected_count = settings["count"] + 1
         content = message.content.strip()
         
-        if not content.isdigit():
-            if settings["allow_ruin"]:
-                await self._handle_count_ruin(message, settings)
-            else:
-                response = settings["default_next_number_message"].format(next_count=expected_count)
-                await handle_invalid_count(
-                    message, response, settings, settings["toggle_next_number_message"]
-                )
-            return
-        
-        message_count = int(content)
-        
-        if message_count == expected_count:
-            leaderboard = settings.get("leaderboard", {})
+        if content.isdecimal() and int(content) == expected_count:
             user_id = message.author.id
-            leaderboard[user_id] = leaderboard.get(user_id, 0) + 1
-            
-            await asyncio.gather(
-                self.settings.update_guild(message.guild, "count", expected_count),
-                self.settings.update_guild(message.guild, "last_user_id", user_id),
-                self.settings.update_guild(message.guild, "leaderboard", leaderboard),
-            )
+            self.settings.update_guild_nowait(message.guild, "count", expected_count)
+            self.settings.update_guild_nowait(message.guild, "last_user_id", user_id)
+            self.settings.increment_leaderboard(message.guild, user_id)
+            history = self._histories.get(message.channel.id)
+            if history is None:
+                history = self._histories[message.channel.id] = CountHistory()
+            history.record(message.id, user_id, expected_count)
             
-            if settings["toggle_reactions"] and perms.add_reactions:
-                await add_reaction(message, settings["default_reaction"])
-            
-            goals = settings.get("goals", [])
-            if goals and expected_count in goals:
-                await self._handle_goal_reached(message, settings, expected_count)
-            
-            if settings.get("toggle_progress") and goals:
-                next_goal = next((g for g in goals if g > expected_count), None)
-                if next_goal and expected_count % settings["progress_interval"] == 0:
-                    remaining = next_goal - expected_count
-                    try:
-                        response = settings["progress_message"].format(
-                            remaining=remaining, goal=next_goal
-                        )
-                    except KeyError as e:
-                        logger.error(f"Progress message format error in guild {message.guild.id}: {e}")
-                        response = "Progress message misconfigured"
-                    
-                    delete_after = (
-                        settings["delete_after"]
-                        if settings.get("toggle_progress_delete", False)
-                        else None
-                    )
-                    await send_message(
-                        message.channel,
-                        response,
-                        delete_after=delete_after,
-                        silent=settings["use_silent"],
-                    )
-        
-        elif settings["allow_ruin"]:
-            await self._handle_count_ruin(message, settings)
-        else:
-            response = settings["default_next_number_message"].format(next_count=expected_count)
-            await handle_invalid_count(
-                message, response, settings, settings["toggle_next_number_message"]
-            )
+            return self._count_accepted(message, settings, perms, expected_count)
+        
+        if settings["allow_ruin"]:
+            if settings.get("toggle_burst_protection", True) and self.bursts.record(message.channel):
+                # No ruin message or ruin role per spam message; the burst summary covers it.
+                self.actions.delete(message.channel, message)
+                if settings["count"]:
+                    self._burst_ruins[message.channel.id] = settings["count"]
+                return self._apply_count_ruin(message, settings, announce=False)
+            return self._apply_count_ruin(message, settings)
+        
+        response = settings["default_next_number_message"].render(next_count=expected_count)
+        return self._reject_count(
+            message, response, settings, settings["toggle_next_number_message"]
+        )
+
+    def _reject_count(
+        self,
+        message: discord.Message,
+        response: str,
+        settings: dict[str, Any],
+        send_response: bool = True,
+    ) -> Optional[Awaitable[None]]:
+        """Delete an invalid count, without replying while the channel is being flooded."""
+        if settings.get("toggle_burst_protection", True) and self.bursts.record(message.channel):
+            self.actions.delete(message.channel, message)
+            return None
+        return handle_invalid_count(
+            message, response, settings, send_response, actions=self.actions
+        )
+
+    async def _announce_burst_end(
+        self, channel: discord.TextChannel, suppressed: int, duration: float
+    ) -> None:
+        settings = await self.settings.get_guild_settings(channel.guild)
+        ruined_at = self._burst_ruins.pop(channel.id, None)
+        ruined = f" The count was ruined at **{ruined_at}**." if ruined_at else ""
+        await send_message(
+            channel,
+            f"🛡️ Cleaned up a spam burst: {suppressed} messages removed over "
+            f"{max(int(duration), 1)}s.{ruined} Next number: **{settings['count'] + 1}**",
+            delete_after=settings["delete_after"] if settings.get("toggle_delete_after") else None,
+            silent=settings["use_silent"],
+        )
+
+    async def _count_accepted(
+        self,
+        message: discord.Message,
+        settings: dict[str, Any],
+        perms: discord.Permissions,
+        count: int,
+    ) -> None:
+        if settings["toggle_reactions"] and perms.add_reactions:
+            self.actions.react(message, settings["default_reaction"])
+        
+        goals = settings["goals"]
+        if goals and count in goals:
+            await self._handle_goal_reached(message, settings, count)
+        
+        if settings.get("toggle_progress") and goals:
+            next_goal = goals.progress_goal(count, settings["progress_interval"])
+            if next_goal:
+                remaining = next_goal - count
+                response = settings["progress_message"].render(
+                    remaining=remaining, goal=next_goal
+                )
+                
+                delete_after = (
+                    settings["delete_after"]
+                    if settings.get("toggle_progress_delete", False)
+                    else None
+                )
+                await send_message(
+                    message.channel,
+                    response,
+                    delete_after=delete_after,
+                    silent=settings["use_silent"],
+                )
 
-    async def _handle_count_ruin(self, message: discord.Message, settings: dict[str, Any]) -> None:
+    def _apply_count_ruin(
+        self, message: discord.Message, settings: dict[str, Any], *, announce: bool = True
+    ) -> Optional[Awaitable[None]]:
+        """
+        Reset the count in the cache and return the announcement to send afterwards.
+
+        With ``announce=False`` the ruin message and ruin role are skipped and None is returned.
+        """
         old_count = settings["count"]
         leaderboard = settings.get("leaderboard", {})
         
         if settings.get("toggle_reset_leaderboard_on_ruin", False) and message.author.id in leaderboard:
-            leaderboard[message.author.id] = 0
-            await self.settings.update_guild(message.guild, "leaderboard", leaderboard)
+            self.settings.set_leaderboard_entry(message.guild, message.author.id, 0)
         
-        await asyncio.gather(
-            self.settings.update_guild(message.guild, "count", 0),
-            self.settings.update_guild(message.guild, "last_user_id", None),
-        )
+        self.settings.update_guild_nowait(message.guild, "count", 0)
+        self.settings.update_guild_nowait(message.guild, "last_user_id", None)
         
-        await assign_ruin_role(self.settings.config, message.author, message.guild, settings)
+        if not announce:
+            return None
+        return self._announce_count_ruin(message, settings, old_count)
+
+    async def _announce_count_ruin(
+        self, message: discord.Message, settings: dict[str, Any], old_count: int
+    ) -> None:
+        await assign_ruin_role(
+            self.settings.config,
+            message.author,
+            message.guild,
+            settings,
+            expiry_scheduler=self.role_expiry,
+        )
         
-        response = settings["ruin_message"].format(user=message.author.mention, count=old_count)
+        response = settings["ruin_message"].render(user=message.author.mention, count=old_count)
         delete_after = (
             settings["delete_after"] if settings.get("toggle_delete_after", False) else None
         )
@@ -226,6 +293,16 @@ class EventHandlers:
         if not guild:
             return
         
+        if not self.settings.is_counting_channel(payload.channel_id):
+            return
+        
+        with metrics.timer("handler.edit"):
+            await self._process_edit(payload, guild)
+
+    async def _process_edit(
+        self, payload: discord.RawMessageUpdateEvent, guild: discord.Guild
+    ) -> None:
+        """Delete an edited count and apply the configured edit punishment."""
         channel = guild.get_channel(payload.channel_id)
         if not isinstance(channel, (discord.TextChannel, discord.Thread, discord.ForumChannel)):
             return
@@ -250,11 +327,7 @@ class EventHandlers:
         if user and user.bot:
             return
         
-        try:
-            await channel.delete_messages([discord.Object(id=payload.message_id)])
-        except (discord.HTTPException, discord.Forbidden) as e:
-            logger.warning(f"Failed to delete edited message {payload.message_id}: {e}")
-            return
+        self.actions.delete(channel, discord.Object(id=payload.message_id))
         
         if settings["allow_ruin"]:
             author = guild.get_member(author_id) or discord.Object(id=author_id)
@@ -263,9 +336,13 @@ class EventHandlers:
                 'guild': guild,
                 'channel': channel
             })()
-            await self._handle_count_ruin(pseudo_msg, settings)
+            queued = time.perf_counter()
+            async with self.sequencer(channel.id):
+                metrics.observe("queue_wait", time.perf_counter() - queued)
+                followup = self._apply_count_ruin(pseudo_msg, settings)
+            await followup
         elif settings["toggle_edit_message"]:
-            response = settings["default_edit_message"].format(next_count=settings["count"] + 1)
+            response = settings["default_edit_message"].render(next_count=settings["count"] + 1)
             delete_after = (
                 settings["delete_after"] if settings.get("toggle_delete_after", False) else None
             )
@@ -276,43 +353,74 @@ class EventHandlers:
                 silent=settings["use_silent"],
             )
 
-    async def on_message_delete(self, message: discord.Message) -> None:
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent) -> None:
         """Handle message deletions in the counting channel."""
-        if message.author.bot or not message.guild:
+        if payload.guild_id is None or not self.settings.is_counting_channel(payload.channel_id):
             return
         
-        if await self.bot.cog_disabled_in_guild(self.bot.get_cog("Counting"), message.guild):
+        with metrics.timer("handler.delete"):
+            await self._process_delete(payload.channel_id, (payload.message_id,))
+
+    async def on_raw_bulk_message_delete(
+        self, payload: discord.RawBulkMessageDeleteEvent
+    ) -> None:
+        """Handle bulk deletions in the counting channel."""
+        if payload.guild_id is None or not self.settings.is_counting_channel(payload.channel_id):
             return
         
-        settings = await self.settings.get_guild_settings(message.guild)
+        with metrics.timer("handler.delete"):
+            await self._process_delete(payload.channel_id, payload.message_ids)
+
+    async def _process_delete(self, channel_id: int, message_ids: Iterable[int]) -> None:
+        """
+        Roll the count back when recent counts are deleted.
+
+        The count goes back to just before the oldest deleted count, and every count from there
+        on is taken off its author's leaderboard entry, since those numbers will be counted
+        again. Only the last ``rollback_window`` counts roll back, so deleting one old message
+        can't undo a long run of counts; older deletions are ignored.
+        """
+        history = self._histories.get(channel_id)
+        if not history:
+            return
         
-        if not settings["toggle"] or message.channel.id != settings["channel"]:
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
             return
         
-        content = message.content.strip()
-        if not content.isdigit():
+        if await self.bot.cog_disabled_in_guild(self.bot.get_cog("Counting"), channel.guild):
             return
         
-        deleted_number = int(content)
-        current_count = settings["count"]
+        settings = await self.settings.get_guild_settings(channel.guild)
         
-        if deleted_number < current_count - 10 or deleted_number > current_count:
+        if not settings["toggle"] or channel_id != settings["channel"]:
             return
         
-        new_count = max(0, deleted_number - 1)
+        queued = time.perf_counter()
+        async with self.sequencer(channel_id):
+            metrics.observe("queue_wait", time.perf_counter() - queued)
+            if history.last_number != settings["count"]:
+                # The count was reset or set by other means since these counts.
+                history.clear()
+                return
             
-        await asyncio.gather(
-            self.settings.update_guild(message.guild, "count", new_count),
-            self.settings.update_guild(message.guild, "last_user_id", None)
-        )
+            deleted_number = history.oldest_of(message_ids)
+            if deleted_number is None or settings["count"] - deleted_number >= settings["rollback_window"]:
+                return
+            
+            leaderboard = settings["leaderboard"]
+            for author_id in history.truncate(deleted_number):
+                if author_id in leaderboard:
+                    self.settings.increment_leaderboard(channel.guild, author_id, -1)
+            new_count = deleted_number - 1
+            self.settings.update_guild_nowait(channel.guild, "count", new_count)
+            self.settings.update_guild_nowait(channel.guild, "last_user_id", history.last_author)
         
-        perms = message.channel.permissions_for(message.guild.me)
+        perms = channel.permissions_for(channel.guild.me)
         if perms.send_messages:
             await send_message(
-                message.channel,
+                channel,
                 f"⚠️ Count message deleted (#{deleted_number}). Reset to **{new_count}**. Next: **{new_count + 1}**",
                 delete_after=settings["delete_after"] if settings.get("toggle_delete_after") else None,
                 silent=settings["use_silent"]
             )
-
-
@@ -0,0 +1,201 @@
+"""
+MIT License
+
+Copyright (c) 2024-present IsThrill
+Originally created by ltzmax (2022-2025)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import heapq
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional, Tuple
+
+import discord
+from red_commons.logging import getLogger
+from redbot.core import Config
+
+from .metrics import metrics
+
+logger = getLogger("red.thrillcogs.counting.expiry")
+
+# Role removals running at once across all guilds.
+ROLE_CONCURRENCY = 4
+# A guild that hits a rate limit or a server error backs off, doubling from BACKOFF_BASE up
+# to BACKOFF_MAX seconds, and gives up on the removal after MAX_ATTEMPTS tries.
+BACKOFF_BASE = 5
+BACKOFF_MAX = 300
+MAX_ATTEMPTS = 5
+# How long to wait before retrying a removal that ran out of attempts.
+RETRY_DELAY = 60
+
+ExpiryEntry = Tuple[float, int, int, int]
+
+
+class RoleExpiryScheduler:
+    """
+    Removes temporary ruin roles when they expire.
+
+    Pending expiries from every guild's ``temp_roles`` are loaded once into a min-heap of
+    ``(expiry, guild_id, member_id, role_id)``. A single task sleeps until the earliest one is
+    due, so the cost is proportional to the roles that expire rather than to the number of
+    guilds. ``schedule`` adds new entries and wakes the task if one is due sooner.
+
+    Due entries are handed in batches to one worker per guild. At most ``ROLE_CONCURRENCY``
+    removals run at once, and a guild that is rate limited backs off without holding up the
+    others.
+
+    ``temp_roles`` stays the source of truth and doubles as the persisted queue: an entry is
+    only cleared once its role is gone, so removals interrupted by an unload are picked up
+    again on the next load. A heap entry whose stored expiry has moved (the member ruined the
+    count again) or has been removed is skipped when it comes up.
+    """
+
+    def __init__(self, bot, config: Config):
+        self.bot = bot
+        self.config = config
+        self._heap: List[ExpiryEntry] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._queues: Dict[int, Deque[ExpiryEntry]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(ROLE_CONCURRENCY)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for worker in self._workers.values():
+            worker.cancel()
+        self._workers.clear()
+        self._queues.clear()
+
+    def schedule(self, guild_id: int, member_id: int, role_id: int, expiry: float) -> None:
+        """Add a role expiry, waking the scheduler if it is now the earliest one."""
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (expiry, guild_id, member_id, role_id))
+        if earliest is None or expiry < earliest:
+            self._wakeup.set()
+
+    async def _load(self) -> None:
+        for guild in self.bot.guilds:
+            temp_roles = await self.config.guild(guild).temp_roles()
+            for member_id, data in temp_roles.items():
+                self._heap.append((data["expiry"], guild.id, int(member_id), data["role_id"]))
+        heapq.heapify(self._heap)
+        logger.debug(f"Loaded {len(self._heap)} temporary ruin roles")
+
+    async def _run(self) -> None:
+        await self.bot.wait_until_ready()
+        await self._load()
+        while True:
+            self._wakeup.clear()
+            now = datetime.now(timezone.utc).timestamp()
+            while self._heap and self._heap[0][0] <= now:
+                self._enqueue(heapq.heappop(self._heap))
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _enqueue(self, entry: ExpiryEntry) -> None:
+        guild_id = entry[1]
+        self._queues.setdefault(guild_id, deque()).append(entry)
+        if guild_id not in self._workers:
+            self._workers[guild_id] = asyncio.create_task(self._guild_worker(guild_id))
+
+    async def _guild_worker(self, guild_id: int) -> None:
+        queue = self._queues[guild_id]
+        try:
+            while queue:
+                entry = queue.popleft()
+                try:
+                    await self._expire(*entry)
+                except Exception:
+                    logger.exception(
+                        f"Failed to expire ruin role for member {entry[2]} in {guild_id}"
+                    )
+        finally:
+            self._queues.pop(guild_id, None)
+            self._workers.pop(guild_id, None)
+
+    async def _expire(self, expiry: float, guild_id: int, member_id: int, role_id: int) -> None:
+        group = self.config.guild_from_id(guild_id)
+        data = await group.get_raw("temp_roles", str(member_id), default=None)
+        if data is None or data["expiry"] != expiry or data["role_id"] != role_id:
+            return  # Stale entry: removed or rescheduled since.
+
+        guild = self.bot.get_guild(guild_id)
+        member = guild.get_member(member_id) if guild else None
+        role = guild.get_role(role_id) if guild else None
+        if member and role and role in member.roles:
+            if not await self._remove_role(member, role):
+                retry = datetime.now(timezone.utc).timestamp() + RETRY_DELAY
+                await group.set_raw(
+                    "temp_roles", str(member_id), value={"role_id": role_id, "expiry": retry}
+                )
+                self.schedule(guild_id, member_id, role_id, retry)
+                return
+        await group.clear_raw("temp_roles", str(member_id))
+
+    async def _remove_role(self, member: discord.Member, role: discord.Role) -> bool:
+        """
+        Remove a role, backing off on rate limits and server errors.
+
+        Returns False if the removal should be retried later. Permanent failures are logged
+        and count as done, since retrying can't fix them.
+        """
+        delay = BACKOFF_BASE
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                async with self._semaphore:
+                    with metrics.timer("api.roles"):
+                        await member.remove_roles(role, reason="Temporary ruin role expired")
+                return True
+            except discord.Forbidden as e:
+                logger.warning(f"Failed to remove role {role.name} in {member.guild.id}: {e}")
+                return True
+            except discord.NotFound:
+                return True
+            except discord.HTTPException as e:
+                if e.status != 429 and e.status < 500:
+                    logger.warning(f"Failed to remove role {role.name} in {member.guild.id}: {e}")
+                    return True
+                if attempt == MAX_ATTEMPTS:
+                    logger.info(
+                        f"Removing role {role.name} in {member.guild.id} failed ({e.status}), "
+                        f"attempt {attempt}/{MAX_ATTEMPTS}; retrying later"
+                    )
+                    break
+                wait = getattr(e, "retry_after", None) or delay
+                logger.info(
+                    f"Removing role {role.name} in {member.guild.id} failed ({e.status}), "
+                    f"attempt {attempt}/{MAX_ATTEMPTS}; backing off {wait:.0f}s"
+                )
+                # Sleeping outside the semaphore lets other guilds keep going.
+                await asyncio.sleep(wait)
+                delay = min(delay * 2, BACKOFF_MAX)
+        return False
@@ -0,0 +1,198 @@
+"""
+MIT License
+
+Copyright (c) 2024-present IsThrill
+Originally created by ltzmax (2022-2025)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+RULE_KINDS = ("sequence", "powers")
+# Every rule is checked on each count, so keep the list short.
+MAX_GOAL_RULES = 10
+
+
+class GoalRule:
+    """
+    A recurring goal, evaluated on demand instead of being stored as a list.
+
+    - ``sequence``: ``start``, ``start + step``, ``start + 2 * step``, ...
+      ("every N counts" is a sequence with ``start == step == N``)
+    - ``powers``: ``step``, ``step ** 2``, ``step ** 3``, ... (``step`` is the base)
+    """
+
+    __slots__ = ("kind", "start", "step")
+
+    def __init__(self, kind: str, start: int, step: int):
+        if kind not in RULE_KINDS:
+            raise ValueError(f"Unknown goal rule {kind!r}")
+        if step < (2 if kind == "powers" else 1) or start < 1:
+            raise ValueError("Goal rules need a positive start and step, and a base of 2 or more")
+        self.kind = kind
+        self.start = step if kind == "powers" else start
+        self.step = step
+
+    @classmethod
+    def from_config(cls, data: Dict[str, Any]) -> "GoalRule":
+        return cls(data["kind"], data["start"], data["step"])
+
+    def to_config(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "start": self.start, "step": self.step}
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, GoalRule) and self.to_config() == other.to_config()
+
+    def __repr__(self) -> str:
+        return f"GoalRule({self.kind!r}, {self.start}, {self.step})"
+
+    def describe(self) -> str:
+        if self.kind == "powers":
+            return f"Every power of {self.step} ({self.step}, {self.step ** 2}, ...)"
+        if self.start == self.step:
+            return f"Every {self.step} counts"
+        return f"Every {self.step} counts from {self.start}"
+
+    def matches(self, count: int) -> bool:
+        if count < self.start:
+            return False
+        if self.kind == "sequence":
+            return (count - self.start) % self.step == 0
+        while count % self.step == 0:
+            count //= self.step
+        return count == 1
+
+    def next_after(self, count: int) -> int:
+        """Return the first goal of this rule above ``count``."""
+        if count < self.start:
+            return self.start
+        if self.kind == "sequence":
+            return self.start + ((count - self.start) // self.step + 1) * self.step
+        goal = self.start
+        while goal <= count:
+            goal *= self.step
+        return goal
+
+
+class GoalIndex(Sequence):
+    """
+    A guild's counting goals, kept sorted for bisect lookups.
+
+    Membership and "next goal after" lookups are O(log n). ``progress_goal`` additionally
+    remembers the next count at which a progress message is due, so the common case of a
+    count with nothing to announce is a comparison.
+
+    The index is a read-only ``Sequence`` of the explicit goals in ascending order; change it
+    with ``add`` and ``remove`` and store it with ``to_config``. Recurring ``rules`` also
+    count for ``in``, ``next_after`` and progress, but are never used up when reached.
+    """
+
+    __slots__ = ("_goals", "rules", "version", "_plan")
+
+    def __init__(self, goals: Iterable[int] = (), rules: Iterable[GoalRule] = ()):
+        self._goals: List[int] = sorted(set(goals))
+        self.rules: Tuple[GoalRule, ...] = tuple(rules)
+        self.version = 0
+        # (version, interval, low, at, goal): no announcement for counts in (low, at), then
+        # ``goal`` is announced at ``at``.
+        self._plan: Optional[Tuple[int, int, int, float, Optional[int]]] = None
+
+    def __len__(self) -> int:
+        return len(self._goals)
+
+    def __getitem__(self, index: Union[int, slice]):
+        return self._goals[index]
+
+    def __bool__(self) -> bool:
+        return bool(self._goals or self.rules)
+
+    def __contains__(self, goal: object) -> bool:
+        if not isinstance(goal, int):
+            return False
+        return self._is_explicit(goal) or any(rule.matches(goal) for rule in self.rules)
+
+    def __repr__(self) -> str:
+        return f"GoalIndex({self._goals!r}, rules={self.rules!r})"
+
+    def _is_explicit(self, goal: int) -> bool:
+        i = bisect_left(self._goals, goal)
+        return i < len(self._goals) and self._goals[i] == goal
+
+    def to_config(self) -> List[int]:
+        return list(self._goals)
+
+    def add(self, goal: int) -> bool:
+        """Add a goal, returning False if it was already set."""
+        if self._is_explicit(goal):
+            return False
+        insort(self._goals, goal)
+        self.version += 1
+        return True
+
+    def remove(self, goal: int) -> bool:
+        """Remove a goal, returning False if it wasn't set."""
+        i = bisect_left(self._goals, goal)
+        if i == len(self._goals) or self._goals[i] != goal:
+            return False
+        del self._goals[i]
+        self.version += 1
+        return True
+
+    def set_rules(self, rules: Iterable[GoalRule]) -> None:
+        self.rules = tuple(rules)
+        self.version += 1
+
+    def next_after(self, count: int) -> Optional[int]:
+        """Return the first goal above ``count``, if any."""
+        i = bisect_right(self._goals, count)
+        candidates = [rule.next_after(count) for rule in self.rules]
+        if i < len(self._goals):
+            candidates.append(self._goals[i])
+        return min(candidates, default=None)
+
+    def progress_goal(self, count: int, interval: int) -> Optional[int]:
+        """
+        Return the goal to announce progress towards when the count reaches ``count``.
+
+        Progress is announced on every multiple of ``interval`` that has a goal above it.
+        """
+        plan = self._plan
+        if (
+            plan is not None
+            and plan[0] == self.version
+            and plan[1] == interval
+            and plan[2] < count <= plan[3]
+        ):
+            if count < plan[3]:
+                return None
+            goal = plan[4]
+        else:
+            goal = self.next_after(count) if count % interval == 0 else None
+        self._plan_from(count, interval)
+        return goal
+
+    def _plan_from(self, count: int, interval: int) -> None:
+        at = (count // interval + 1) * interval
+        goal = self.next_after(at)
+        if goal is None:
+            at = float("inf")
+        self._plan = (self.version, interval, count, at, goal)
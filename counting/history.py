@@ -0,0 +1,112 @@
+"""
+MIT License
+
+Copyright (c) 2024-present IsThrill
+Originally created by ltzmax (2022-2025)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from array import array
+from typing import Iterable, List, Optional
+
+# Accepted counts remembered per channel. Deleting an older count doesn't roll anything back.
+HISTORY_SIZE = 100
+
+
+class CountHistory:
+    """
+    The last accepted counts in a counting channel, used to roll back deleted counts.
+
+    Message and author ids are kept in two fixed-size arrays used as a ring buffer. Accepted
+    counts are consecutive, so the numbers aren't stored: the newest entry is
+    ``last_number`` and each older one is one less. Recording a number that doesn't follow
+    on (after a ruin or a manual reset) starts the history over.
+
+    The history is in memory only, so counts from before a reload can't be rolled back.
+    Deletions are looked up by message id, so they don't depend on discord.py's message
+    cache.
+    """
+
+    __slots__ = ("_message_ids", "_author_ids", "_end", "_size", "last_number")
+
+    def __init__(self, size: int = HISTORY_SIZE):
+        self._message_ids = array("Q", bytes(8 * size))
+        self._author_ids = array("Q", bytes(8 * size))
+        self._end = 0
+        self._size = 0
+        self.last_number: Optional[int] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def last_author(self) -> Optional[int]:
+        """Return the author of the newest count, if any."""
+        if not self._size:
+            return None
+        return self._author_ids[self._end - 1]
+
+    def record(self, message_id: int, author_id: int, number: int) -> None:
+        """Add an accepted count."""
+        if self._size and number != self.last_number + 1:
+            self.clear()
+        capacity = len(self._message_ids)
+        self._message_ids[self._end] = message_id
+        self._author_ids[self._end] = author_id
+        self._end = (self._end + 1) % capacity
+        self._size = min(self._size + 1, capacity)
+        self.last_number = number
+
+    def number_of(self, message_id: int) -> Optional[int]:
+        """Return the number counted by ``message_id``, if it is in the history."""
+        try:
+            position = self._message_ids.index(message_id)
+        except ValueError:
+            return None
+        age = (self._end - 1 - position) % len(self._message_ids)
+        return self.last_number - age if age < self._size else None
+
+    def oldest_of(self, message_ids: Iterable[int]) -> Optional[int]:
+        """Return the lowest number counted by any of ``message_ids``."""
+        numbers = [n for n in map(self.number_of, message_ids) if n is not None]
+        return min(numbers, default=None)
+
+    def truncate(self, number: int) -> List[int]:
+        """
+        Drop the counts from ``number`` onwards and return their authors, one per count.
+
+        ``number`` must be in the history.
+        """
+        capacity = len(self._message_ids)
+        authors = []
+        for _ in range(self.last_number - number + 1):
+            self._end = (self._end - 1) % capacity
+            authors.append(self._author_ids[self._end])
+            self._message_ids[self._end] = 0
+        self._size -= len(authors)
+        self.last_number = number - 1
+        return authors
+
+    def clear(self) -> None:
+        self._message_ids = array("Q", bytes(len(self._message_ids) * 8))
+        self._author_ids = array("Q", bytes(len(self._author_ids) * 8))
+        self._end = 0
+        self._size = 0
+        self.last_number = None
@@ -0,0 +1,191 @@
+"""
+MIT License
+
+Copyright (c) 2024-present IsThrill
+Originally created by ltzmax (2022-2025)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Score changes bigger than this rebuild the index instead of stepping one count at a time.
+_MAX_STEPS = 16
+
+
+class LeaderboardIndex(Mapping):
+    """
+    A guild's leaderboard, stored compactly in rank order.
+
+    Entries live in two parallel arrays sorted by count, highest first: ``_ids`` holds user
+    ids and ``_neg`` holds negated counts, so the runs of equal counts can be found with
+    ``bisect`` on an ascending array. A second pair of arrays maps user ids (sorted) to their
+    position. Moving a user up or down by one count is a single swap with the edge of their
+    run, so the count handler keeps the index in sync in O(log n) and a 200k-counter
+    leaderboard takes a few MB instead of several dicts of boxed ints.
+
+    The index is a read-only ``Mapping`` of ``int`` user ids to counts, iterated in rank order.
+    Users with zero counts are not stored. ``version`` increases on every change so rendered
+    pages can be cached against it.
+    """
+
+    __slots__ = ("_ids", "_neg", "_keys", "_slots", "version")
+
+    def __init__(self, counts: Optional[Iterable[Tuple[Any, int]]] = None):
+        self.version = 0
+        self._build(counts or ())
+
+    @classmethod
+    def from_config(cls, data: Dict[Any, int]) -> "LeaderboardIndex":
+        """Build an index from a leaderboard as stored in Config, where user ids are ``str``."""
+        return cls(
+            (int(k), v) for k, v in data.items() if isinstance(k, int) or str(k).isdecimal()
+        )
+
+    def to_config(self) -> Dict[str, int]:
+        """Return the leaderboard in the JSON-serializable form stored in Config."""
+        return {str(uid): -neg for uid, neg in zip(self._ids, self._neg)}
+
+    def _build(self, counts: Any) -> None:
+        if isinstance(counts, Mapping):
+            counts = counts.items()
+        ranked = sorted(((int(uid), c) for uid, c in counts if c > 0), key=lambda x: -x[1])
+        self._ids = array("Q", [uid for uid, _ in ranked])
+        self._neg = array("q", [-count for _, count in ranked])
+        by_id = sorted(range(len(ranked)), key=self._ids.__getitem__)
+        self._keys = array("Q", [self._ids[slot] for slot in by_id])
+        self._slots = array("L", by_id)
+
+    def _key_index(self, user_id: int) -> int:
+        """Return where ``user_id`` is in ``_keys``, or -1."""
+        i = bisect_left(self._keys, user_id)
+        if i < len(self._keys) and self._keys[i] == user_id:
+            return i
+        return -1
+
+    def _slot_of(self, user_id: int) -> int:
+        i = self._key_index(user_id) if user_id >= 0 else -1
+        return -1 if i < 0 else self._slots[i]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids)
+
+    def __getitem__(self, user_id: int) -> int:
+        slot = self._slot_of(user_id) if isinstance(user_id, int) else -1
+        if slot < 0:
+            raise KeyError(user_id)
+        return -self._neg[slot]
+
+    def __contains__(self, user_id: object) -> bool:
+        return isinstance(user_id, int) and self._slot_of(user_id) >= 0
+
+    def count_of(self, user_id: int) -> int:
+        """Return a user's count, or 0 if they have not counted."""
+        slot = self._slot_of(user_id)
+        return 0 if slot < 0 else -self._neg[slot]
+
+    def rank_of(self, user_id: int) -> Optional[int]:
+        """Return a user's 1-based leaderboard position, or None if they are unranked."""
+        slot = self._slot_of(user_id)
+        return None if slot < 0 else slot + 1
+
+    def top(self, n: int) -> List[Tuple[int, int]]:
+        """Return the ``n`` highest ``(user_id, count)`` entries."""
+        return self.page(0, n)
+
+    def page(self, number: int, per_page: int = 15) -> List[Tuple[int, int]]:
+        """Return the ``(user_id, count)`` entries on a 0-based page."""
+        start = number * per_page
+        end = start + per_page
+        return [(uid, -neg) for uid, neg in zip(self._ids[start:end], self._neg[start:end])]
+
+    def page_count(self, per_page: int = 15) -> int:
+        return (len(self._ids) + per_page - 1) // per_page
+
+    def items(self) -> Iterable[Tuple[int, int]]:
+        """Iterate ``(user_id, count)`` entries in rank order."""
+        return ((uid, -neg) for uid, neg in zip(self._ids, self._neg))
+
+    def set(self, user_id: int, count: int) -> None:
+        """Set a user's count, moving them to their new position."""
+        delta = count - self.count_of(user_id)
+        if abs(delta) > _MAX_STEPS:
+            counts = dict(self.items())
+            counts[user_id] = count
+            self._build(counts)
+            self.version += 1
+            return
+        for _ in range(delta):
+            self.increment(user_id)
+        for _ in range(-delta):
+            self.decrement(user_id)
+
+    def increment(self, user_id: int) -> None:
+        """Add one count for a user."""
+        self.version += 1
+        key = bisect_left(self._keys, user_id)
+        if key == len(self._keys) or self._keys[key] != user_id:
+            # New counters join the bottom, which is always the run of 1s if it exists.
+            self._keys.insert(key, user_id)
+            self._slots.insert(key, len(self._ids))
+            self._ids.append(user_id)
+            self._neg.append(-1)
+            return
+
+        slot = self._slots[key]
+        neg = self._neg[slot]
+        # The first position of this user's run; everyone above it has a higher count.
+        edge = bisect_left(self._neg, neg)
+        self._swap(slot, edge)
+        self._neg[edge] = neg - 1
+
+    def decrement(self, user_id: int) -> None:
+        """Remove one count from a user, unranking them when they reach 0."""
+        key = self._key_index(user_id)
+        if key < 0:
+            return
+
+        self.version += 1
+        slot = self._slots[key]
+        neg = self._neg[slot]
+        # The last position of this user's run; everyone below it has a lower count.
+        edge = bisect_right(self._neg, neg) - 1
+        self._swap(slot, edge)
+        if neg == -1:
+            # The run of 1s is at the bottom, so ``edge`` is the final position.
+            self._ids.pop()
+            self._neg.pop()
+            key = self._key_index(user_id)
+            del self._keys[key], self._slots[key]
+            return
+        self._neg[edge] = neg + 1
+
+    def _swap(self, i: int, j: int) -> None:
+        if i == j:
+            return
+        a, b = self._ids[i], self._ids[j]
+        self._ids[i], self._ids[j] = b, a
+        self._slots[self._key_index(a)] = j
+        self._slots[self._key_index(b)] = i
@@ -0,0 +1,133 @@
+"""
+MIT License
+
+Copyright (c) 2024-present IsThrill
+Originally created by ltzmax (2022-2025)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from red_commons.logging import TRACE, getLogger
+
+logger = getLogger("red.thrillcogs.counting.metrics")
+
+# Upper bounds of the histogram buckets, in milliseconds. The last bucket is unbounded.
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+MetricsHook = Callable[[str, float], None]
+
+
+class LatencyHistogram:
+    """A fixed-bucket latency histogram with a running count, total and maximum."""
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets: List[int] = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.buckets[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """
+        Return an upper bound for the ``p``-th percentile (0-100), in milliseconds.
+
+        This is the bound of the bucket the percentile falls in, capped at the observed maximum.
+        """
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+
+class LatencyMetrics:
+    """
+    Latency histograms for the counting hot path, keyed by metric name.
+
+    Names are dotted: ``handler.message``, ``queue_wait``, ``config.write``, ``api.send`` and
+    so on. Every observation is also passed to the registered hooks, so another cog can
+    forward them to its own metrics system, and logged at TRACE level as ``metric=... ms=...``.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.since = time.time()
+        self._hooks: List[MetricsHook] = []
+
+    def add_hook(self, hook: MetricsHook) -> None:
+        """Call ``hook(name, seconds)`` for every observation."""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: MetricsHook) -> None:
+        self._hooks.remove(hook)
+
+    def observe(self, name: str, seconds: float) -> None:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.observe(seconds * 1000)
+        if logger.isEnabledFor(TRACE):
+            logger.log(TRACE, f"metric={name} ms={seconds * 1000:.2f}")
+        for hook in self._hooks:
+            try:
+                hook(name, seconds)
+            except Exception:
+                logger.exception(f"Metrics hook {hook!r} failed")
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Time the body of a ``with`` block, including any awaits inside it."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def get(self, name: str) -> Optional[LatencyHistogram]:
+        return self.histograms.get(name)
+
+    def reset(self) -> None:
+        self.histograms.clear()
+        self.since = time.time()
+
+
+# Shared by the settings manager, event handlers and utils so every call site can record
+# without threading an extra argument through.
+metrics = LatencyMetrics()
@@ -0,0 +1,111 @@
+"""
+MIT License
+
+Copyright (c) 2024-present IsThrill
+Originally created by ltzmax (2022-2025)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+import discord
+from red_commons.logging import getLogger
+
+logger = getLogger("red.thrillcogs.counting.resolver")
+
+
+class UserNameResolver:
+    """
+    Shared, rate-limit friendly lookup of user id to display name.
+
+    Names come from the bot's user cache when possible, otherwise from ``fetch_user`` through
+    a small bounded pool so a large leaderboard can't flood the REST rate limiter. Results are
+    kept in an LRU cache with a TTL; deleted accounts are cached as ``None`` for longer so they
+    are not fetched again on every page view. Concurrent requests for the same id share a
+    single fetch.
+    """
+
+    def __init__(
+        self,
+        bot,
+        *,
+        max_concurrency: int = 4,
+        max_size: int = 10_000,
+        ttl: float = 600,
+        negative_ttl: float = 3600,
+    ):
+        self.bot = bot
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._cache: "OrderedDict[int, Tuple[Optional[str], float]]" = OrderedDict()
+        self._inflight: Dict[int, asyncio.Future] = {}
+
+    async def resolve(self, user_ids: Iterable[int]) -> Dict[int, Optional[str]]:
+        """Return a mapping of user id to name, or ``None`` for users that can't be found."""
+        names: Dict[int, Optional[str]] = {}
+        pending = []
+        now = time.monotonic()
+        for uid in user_ids:
+            cached = self._cache.get(uid)
+            if cached is not None and cached[1] > now:
+                self._cache.move_to_end(uid)
+                names[uid] = cached[0]
+                continue
+            user = self.bot.get_user(uid)
+            if user is not None:
+                names[uid] = self._store(uid, user.display_name, self.ttl)
+                continue
+            future = self._inflight.get(uid)
+            if future is None:
+                future = self._inflight[uid] = asyncio.ensure_future(self._fetch(uid))
+            pending.append((uid, future))
+
+        for uid, future in pending:
+            names[uid] = await asyncio.shield(future)
+        return names
+
+    def invalidate(self, user_id: int) -> None:
+        self._cache.pop(user_id, None)
+
+    async def _fetch(self, uid: int) -> Optional[str]:
+        try:
+            async with self._semaphore:
+                user = await self.bot.fetch_user(uid)
+        except discord.NotFound:
+            return self._store(uid, None, self.negative_ttl)
+        except discord.HTTPException as e:
+            # Not cached: a transient failure shouldn't hide the name for the full TTL.
+            logger.debug(f"Failed to fetch user {uid}: {e}")
+            return None
+        finally:
+            self._inflight.pop(uid, None)
+        return self._store(uid, user.display_name, self.ttl)
+
+    def _store(self, uid: int, name: Optional[str], ttl: float) -> Optional[str]:
+        self._cache[uid] = (name, time.monotonic() + ttl)
+        self._cache.move_to_end(uid)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return name
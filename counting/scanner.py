@@ -0,0 +1,146 @@
+"""
+MIT License
+
+Copyright (c) 2024-present IsThrill
+Originally created by ltzmax (2022-2025)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# (author_id, is_bot, content)
+ScanRecord = Tuple[int, bool, str]
+
+
+class SequenceScanner:
+    """
+    The lenient counting sequence used to rebuild a leaderboard from history.
+
+    Messages are fed oldest first. A number equal to the next expected value is credited to
+    its author, and any '1' is treated as a sequence restart unless ``restarts`` is False.
+    Bot messages, non-numeric messages and numbers out of sequence are only tallied.
+
+    The scanner does no I/O, so it can be driven by the Discord history API, an exported
+    archive or a synthetic stream alike.
+    """
+
+    __slots__ = (
+        "counts",
+        "message_count",
+        "valid_counts",
+        "expected_next",
+        "highest_count_found",
+        "skipped_non_numeric",
+        "bot_messages",
+        "same_user_violations",
+        "out_of_sequence",
+        "last_author_id",
+        "restarts",
+    )
+
+    def __init__(self, counts: Optional[Dict[int, int]] = None, *, restarts: bool = True):
+        self.counts: Dict[int, int] = dict(counts) if counts else {}
+        self.restarts = restarts
+        self.message_count = 0
+        self.valid_counts = 0
+        self.expected_next = 1
+        self.highest_count_found = 0
+        self.skipped_non_numeric = 0
+        self.bot_messages = 0
+        self.same_user_violations = 0
+        self.out_of_sequence = 0
+        self.last_author_id: Optional[int] = None
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "SequenceScanner":
+        """Restore a scanner from a build state, as made by ``export_state``."""
+        scanner = cls({int(k): v for k, v in state["leaderboard"].items()})
+        scanner.message_count = state["message_count"]
+        scanner.valid_counts = state["valid_counts"]
+        scanner.expected_next = state["expected_next"]
+        scanner.highest_count_found = state["highest_count_found"]
+        scanner.skipped_non_numeric = state["skipped_non_numeric"]
+        issues = state["issues"]
+        scanner.bot_messages = issues["bot_messages"]
+        scanner.same_user_violations = issues["same_user_violations"]
+        scanner.out_of_sequence = issues["out_of_sequence"]
+        return scanner
+
+    def export_state(self, state: Dict[str, Any], *, leaderboard: bool = True) -> None:
+        """
+        Write the scanner's totals into a build state dict.
+
+        The leaderboard is copied with string keys so the state stays JSON-serializable; pass
+        ``leaderboard=False`` to skip that copy when only the totals are needed.
+        """
+        state["message_count"] = self.message_count
+        state["valid_counts"] = self.valid_counts
+        state["expected_next"] = self.expected_next
+        state["highest_count_found"] = self.highest_count_found
+        state["skipped_non_numeric"] = self.skipped_non_numeric
+        state["issues"] = {
+            "bot_messages": self.bot_messages,
+            "same_user_violations": self.same_user_violations,
+            "out_of_sequence": self.out_of_sequence,
+        }
+        if leaderboard:
+            state["leaderboard"] = {str(k): v for k, v in self.counts.items()}
+
+    def feed(self, author_id: int, is_bot: bool, content: str) -> None:
+        """Process a single message."""
+        self.feed_many(((author_id, is_bot, content),))
+
+    def feed_many(self, records: Iterable[ScanRecord]) -> int:
+        """Process messages in order and return how many were fed."""
+        counts = self.counts
+        expected_next = self.expected_next
+        highest = self.highest_count_found
+        last_author_id = self.last_author_id
+        restarts = self.restarts
+        fed = valid = bots = non_numeric = out_of_sequence = 0
+        for author_id, is_bot, content in records:
+            fed += 1
+            if is_bot:
+                bots += 1
+                continue
+            content = content.strip()
+            # isdecimal() matches exactly what int() accepts, unlike isdigit() ('²').
+            if not content.isdecimal():
+                non_numeric += 1
+                continue
+            value = int(content)
+            if value == expected_next or (restarts and value == 1):
+                valid += 1
+                if value > highest:
+                    highest = value
+                counts[author_id] = counts.get(author_id, 0) + 1
+                last_author_id = author_id
+                expected_next = value + 1
+            else:
+                out_of_sequence += 1
+        self.expected_next = expected_next
+        self.highest_count_found = highest
+        self.last_author_id = last_author_id
+        self.message_count += fed
+        self.valid_counts += valid
+        self.bot_messages += bots
+        self.skipped_non_numeric += non_numeric
+        self.out_of_sequence += out_of_sequence
+        return fed
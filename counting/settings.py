@@ -23,55 +23,430 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from typing import Any, Dict
+import asyncio
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Set, Tuple
 
 import discord
+from red_commons.logging import getLogger
 from redbot.core import Config
 
+from .goals import GoalIndex, GoalRule
+from .leaderboard import LeaderboardIndex
+from .metrics import metrics
+from .templates import TEMPLATE_FIELDS, MessageTemplate, compile_template
+
+logger = getLogger("red.thrillcogs.counting.settings")
+
+_MISSING = object()
+
+# Config defaults registered by the cog. Read-only; register copies of them.
+DEFAULT_GUILD: Mapping[str, Any] = MappingProxyType({
+    "count": 0,
+    "channel": None,
+    "toggle": False,
+    "delete_after": 10,
+    "toggle_delete_after": False,
+    "default_edit_message": "You can't edit your messages here. Next number: {next_count}",
+    "default_next_number_message": "Next number should be {next_count}.",
+    "default_same_user_message": "You cannot count consecutively. Wait for someone else.",
+    "toggle_edit_message": False,
+    "toggle_next_number_message": False,
+    "same_user_to_count": False,
+    "last_user_id": None,
+    "toggle_reactions": False,
+    "default_reaction": "✅",
+    "use_silent": False,
+    "min_account_age": 0,
+    "allow_ruin": False,
+    "ruin_role_id": None,
+    "ruin_message": "{user} ruined the count at {count}! Starting back at 1.",
+    "temp_roles": {},
+    "ruin_role_duration": None,
+    "excluded_roles": [],
+    "goals": [],
+    "goal_rules": [],
+    "goal_message": "{user} reached the goal of {goal}! Congratulations!",
+    "toggle_goal_delete": False,
+    "progress_interval": 10,
+    "progress_message": "{remaining} counts left to reach the goal of {goal}!",
+    "toggle_progress_delete": False,
+    "toggle_progress": False,
+    "reset_roles": [],
+    "leaderboard": {},
+    "toggle_reset_leaderboard_on_ruin": False,
+    "toggle_burst_protection": True,
+    "rollback_window": 10,
+    "build_checkpoint": {},
+    "last_message_id": None,
+    "catchup_after_id": None,
+})
+
+DEFAULT_USER: Mapping[str, Any] = MappingProxyType({
+    "count": 0,
+    "last_count_timestamp": None,
+})
+
+DEFAULT_GLOBAL: Mapping[str, Any] = MappingProxyType({
+    "write_behind_interval": 5.0,
+    "write_behind_threshold": 100,
+    "active_channels": None,
+    "warm_up_active_guilds": True,
+    "cache_max_guilds": 1000,
+})
+
+
+def _normalize_guild_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replace the leaderboard loaded from Config, keyed by ``str``, with a ``LeaderboardIndex``
+    and the goal list and rules with a ``GoalIndex``. Message templates are compiled.
+    """
+    data["leaderboard"] = LeaderboardIndex.from_config(data.get("leaderboard") or {})
+    data["goal_rules"] = [GoalRule.from_config(rule) for rule in data.get("goal_rules") or ()]
+    data["goals"] = GoalIndex(data.get("goals") or (), data["goal_rules"])
+    for key in TEMPLATE_FIELDS:
+        if key in data:
+            data[key] = compile_template(key, data[key], strict=False)
+    return data
+
 
 class SettingsManager:
-    """Manages guild and user settings with caching."""
+    """
+    Manages guild and user settings with caching.
+
+    Hot-path updates made through ``update_guild_nowait`` are write-behind: the cache is the
+    source of truth and dirty keys are coalesced and flushed to Config every
+    ``flush_interval`` seconds, as soon as ``flush_threshold`` keys are dirty, or on ``close``.
 
-    def __init__(self, config: Config):
+    Leaderboard entries are stored as individual ``leaderboard.<user_id>`` keys, so a count
+    only writes the entry that changed instead of the whole leaderboard. In the cache, a
+    guild's ``leaderboard`` is a ``LeaderboardIndex`` keyed by ``int`` user ids; it is only
+    changed through the leaderboard methods here. Likewise ``goals`` is a ``GoalIndex``.
+
+    Guilds and users are loaded on first access. Active counting channels are remembered per
+    guild in the ``active_channels`` global, so ``is_counting_channel`` can reject unrelated
+    messages without loading anything, and their guilds can be warmed up at startup. Once more
+    than ``max_guilds`` guilds are cached, the least recently used ones that have been idle
+    for ``idle_seconds`` and have nothing left to flush are evicted.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        flush_interval: float = 5.0,
+        flush_threshold: int = 100,
+        max_guilds: int = 1000,
+        max_users: int = 10_000,
+        idle_seconds: float = 600,
+    ):
         self.config = config
-        self._guild_cache: Dict[int, Dict[str, Any]] = {}
-        self._user_cache: Dict[int, Dict[str, Any]] = {}
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.max_guilds = max_guilds
+        self.max_users = max_users
+        self.idle_seconds = idle_seconds
+        self._guild_cache: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._user_cache: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._last_access: Dict[int, float] = {}
+        self._active_channels: Dict[int, int] = {}
+        self._counting_channels: Set[int] = set()
+        self._channels_loaded = False
+        self._seen_guilds: Set[int] = set()
+        self._dirty: Dict[int, Set[Tuple[Any, ...]]] = {}
+        self._dirty_count = 0
+        self._flush_event = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
 
     async def initialize(self) -> None:
-        """Load guild and user settings into cache."""
-        self._guild_cache = await self.config.all_guilds()
-        self._user_cache = await self.config.all_users()
+        """Start the write-behind flusher and warm up the guilds with active counting channels."""
+        self.flush_interval = await self.config.write_behind_interval()
+        self.flush_threshold = await self.config.write_behind_threshold()
+        self.max_guilds = await self.config.cache_max_guilds()
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+        active = await self.config.active_channels()
+        if active is None:
+            # One-time migration for data saved before active channels were tracked.
+            active = {
+                str(guild_id): data["channel"]
+                for guild_id, data in (await self.config.all_guilds()).items()
+                if data.get("toggle") and data.get("channel")
+            }
+            await self.config.active_channels.set(active)
+        self._active_channels = {int(k): v for k, v in active.items()}
+        self._counting_channels = set(self._active_channels.values())
+        self._channels_loaded = True
+        if await self.config.warm_up_active_guilds():
+            for guild_id in list(self._active_channels)[: self.max_guilds]:
+                if guild_id not in self._guild_cache:
+                    await self._load_guild(guild_id)
+
+    async def close(self) -> None:
+        """Stop the flusher and write out everything that is still dirty."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    def configure_write_behind(self, flush_interval: float, flush_threshold: int) -> None:
+        """
+        Change the write-behind limits.
+
+        An interval of 0 flushes as soon as a key becomes dirty (write-through).
+        """
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._flush_event.set()
+
+    def configure_cache(self, max_guilds: int) -> None:
+        """Change how many guilds are kept cached and evict any excess."""
+        self.max_guilds = max_guilds
+        self._evict()
 
     async def get_guild_settings(self, guild: discord.Guild) -> Dict[str, Any]:
         """Retrieve guild settings from cache or Config."""
-        if guild.id not in self._guild_cache:
-            self._guild_cache[guild.id] = await self.config.guild(guild).all()
-        return self._guild_cache[guild.id]
+        cached = self._guild_cache.get(guild.id)
+        if cached is None:
+            return await self._load_guild(guild.id)
+        self._guild_cache.move_to_end(guild.id)
+        self._last_access[guild.id] = time.monotonic()
+        return cached
+
+    async def _load_guild(self, guild_id: int) -> Dict[str, Any]:
+        data = _normalize_guild_data(await self.config.guild_from_id(guild_id).all())
+        # Another task may have loaded the guild meanwhile; its copy may already be modified.
+        cached = self._guild_cache.setdefault(guild_id, data)
+        if guild_id not in self._seen_guilds:
+            # First load since the cog started, before any live message: everything after the
+            # last processed message was missed while offline. The oldest such point is kept
+            # until `countingset misc catchup` has scanned past it.
+            self._seen_guilds.add(guild_id)
+            if cached.get("last_message_id") and not cached.get("catchup_after_id"):
+                cached["catchup_after_id"] = cached["last_message_id"]
+                self._mark_dirty(guild_id, ("catchup_after_id",))
+        self._guild_cache.move_to_end(guild_id)
+        self._last_access[guild_id] = time.monotonic()
+        self._evict()
+        return cached
+
+    def _evict(self) -> None:
+        """Drop the least recently used guilds over ``max_guilds`` that can be reloaded safely."""
+        if len(self._guild_cache) <= self.max_guilds or self._flush_lock.locked():
+            # While flushing, guilds that are being written no longer show as dirty.
+            return
+        now = time.monotonic()
+        for guild_id in list(self._guild_cache):
+            if len(self._guild_cache) <= self.max_guilds:
+                break
+            if now - self._last_access.get(guild_id, 0) < self.idle_seconds:
+                # Everything after this guild was used more recently.
+                break
+            if self._dirty.get(guild_id):
+                continue
+            del self._guild_cache[guild_id]
+            self._last_access.pop(guild_id, None)
+
+    def is_counting_channel(self, channel_id: int) -> bool:
+        """
+        Return whether a channel is an enabled counting channel, without touching Config.
+
+        Before ``initialize`` has loaded the active channels this errs on the side of True.
+        """
+        return channel_id in self._counting_channels or not self._channels_loaded
+
+    async def _update_active_channel(self, guild_id: int) -> None:
+        """Keep the active channel set in sync with a guild's channel and toggle."""
+        settings = self._guild_cache.get(guild_id, {})
+        channel_id = settings.get("channel") if settings.get("toggle") else None
+        if self._active_channels.get(guild_id) == channel_id:
+            return
+        if channel_id:
+            self._active_channels[guild_id] = channel_id
+        else:
+            self._active_channels.pop(guild_id, None)
+        self._counting_channels = set(self._active_channels.values())
+        await self.config.active_channels.set(
+            {str(k): v for k, v in self._active_channels.items()}
+        )
+
+    async def get_leaderboard(self, guild: discord.Guild) -> LeaderboardIndex:
+        """Retrieve the ranked leaderboard index for a guild."""
+        return (await self.get_guild_settings(guild))["leaderboard"]
 
     async def get_user_settings(self, user: discord.Member) -> Dict[str, Any]:
         """Retrieve user settings from cache or Config."""
-        if user.id not in self._user_cache:
-            self._user_cache[user.id] = await self.config.user(user).all()
-        return self._user_cache[user.id]
+        cached = self._user_cache.get(user.id)
+        if cached is None:
+            return await self._load_user(user.id)
+        self._user_cache.move_to_end(user.id)
+        return cached
+
+    async def _load_user(self, user_id: int) -> Dict[str, Any]:
+        data = await self.config.user_from_id(user_id).all()
+        cached = self._user_cache.setdefault(user_id, data)
+        # User settings are written through, so any user can be dropped.
+        while len(self._user_cache) > self.max_users:
+            self._user_cache.popitem(last=False)
+        return cached
 
     async def update_guild(self, guild: discord.Guild, key: str, value: Any) -> None:
         """Update guild cache and Config."""
-        await self.config.guild(guild).set_raw(key, value=value)
-        if guild.id not in self._guild_cache:
-            self._guild_cache[guild.id] = await self.config.guild(guild).all()
+        settings = await self.get_guild_settings(guild)
+        if key == "leaderboard" and not isinstance(value, LeaderboardIndex):
+            value = LeaderboardIndex(value)
+        elif key == "goals" and not isinstance(value, GoalIndex):
+            value = GoalIndex(value, settings["goal_rules"])
+        elif key == "goal_rules":
+            value = [r if isinstance(r, GoalRule) else GoalRule.from_config(r) for r in value]
+        elif key in TEMPLATE_FIELDS and not isinstance(value, MessageTemplate):
+            value = compile_template(key, value)
+
+        if key == "goal_rules":
+            stored = [rule.to_config() for rule in value]
+        elif isinstance(value, (LeaderboardIndex, GoalIndex)):
+            stored = value.to_config()
+        elif isinstance(value, MessageTemplate):
+            stored = str(value)
+        else:
+            stored = value
+        # The cache is updated and any pending write of the key dropped before awaiting, so a
+        # flush running meanwhile can't write the old value over this one.
+        settings[key] = value
+        if key == "goal_rules":
+            settings["goals"].set_rules(value)
+        self._discard_dirty(guild.id, lambda path: path[0] == key)
+        with metrics.timer("config.write"):
+            await self.config.guild(guild).set_raw(key, value=stored)
+        if key in ("channel", "toggle"):
+            await self._update_active_channel(guild.id)
+
+    def update_guild_nowait(self, guild: discord.Guild, key: str, value: Any) -> None:
+        """
+        Update the guild cache immediately and mark the key for the next flush.
+
+        The guild must already be cached (e.g. through ``get_guild_settings``).
+        """
         self._guild_cache[guild.id][key] = value
+        self._mark_dirty(guild.id, (key,))
+
+    def increment_leaderboard(self, guild: discord.Guild, user_id: int, amount: int = 1) -> int:
+        """
+        Add ``amount`` to a user's leaderboard entry and return the new total.
+
+        Only that user's entry is written on the next flush. The guild must already be cached.
+        """
+        leaderboard = self._guild_cache[guild.id]["leaderboard"]
+        total = leaderboard.count_of(user_id) + amount
+        if amount == 1:
+            leaderboard.increment(user_id)
+        elif amount == -1:
+            leaderboard.decrement(user_id)
+        else:
+            leaderboard.set(user_id, total)
+        self._mark_dirty(guild.id, ("leaderboard", user_id))
+        return total
+
+    def set_leaderboard_entry(self, guild: discord.Guild, user_id: int, value: int) -> None:
+        """Set a single user's leaderboard entry. The guild must already be cached."""
+        self._guild_cache[guild.id]["leaderboard"].set(user_id, value)
+        self._mark_dirty(guild.id, ("leaderboard", user_id))
+
+    async def replace_leaderboard(
+        self, guild: discord.Guild, leaderboard: Mapping[int, int]
+    ) -> None:
+        """Replace the whole leaderboard, discarding any entry writes still pending."""
+        self._discard_dirty(guild.id, lambda path: path[0] == "leaderboard")
+        await self.update_guild(guild, "leaderboard", leaderboard)
+
+    async def delete_leaderboard_entry(self, guild_id: int, user_id: int) -> None:
+        """Remove a user's leaderboard entry from the cache and Config."""
+        self._discard_dirty(guild_id, lambda path: path == ("leaderboard", user_id))
+        cached = self._guild_cache.get(guild_id)
+        if cached is not None:
+            cached["leaderboard"].set(user_id, 0)
+        with metrics.timer("config.write"):
+            await self.config.guild_from_id(guild_id).clear_raw("leaderboard", str(user_id))
+
+    def _mark_dirty(self, guild_id: int, path: Tuple[Any, ...]) -> None:
+        paths = self._dirty.setdefault(guild_id, set())
+        if path not in paths:
+            paths.add(path)
+            self._dirty_count += 1
+        if self.flush_interval <= 0 or self._dirty_count >= self.flush_threshold:
+            self._flush_event.set()
+
+    def _discard_dirty(self, guild_id: int, predicate) -> None:
+        paths = self._dirty.get(guild_id)
+        if not paths:
+            return
+        stale = {path for path in paths if predicate(path)}
+        paths -= stale
+        self._dirty_count -= len(stale)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._flush_event.wait(), timeout=self.flush_interval or None
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write every dirty guild key to Config."""
+        async with self._flush_lock:
+            dirty, self._dirty, self._dirty_count = self._dirty, {}, 0
+            for guild_id, paths in dirty.items():
+                cached = self._guild_cache.get(guild_id)
+                if cached is None:
+                    continue
+                group = self.config.guild_from_id(guild_id)
+                for path in paths:
+                    value = cached
+                    for part in path:
+                        value = value.get(part, _MISSING)
+                        if value is _MISSING:
+                            break
+                    identifiers = [str(part) for part in path]
+                    try:
+                        with metrics.timer("config.write"):
+                            if value is _MISSING:
+                                await group.clear_raw(*identifiers)
+                            else:
+                                await group.set_raw(*identifiers, value=value)
+                    except Exception:
+                        logger.exception(f"Failed to flush {'.'.join(identifiers)} for guild {guild_id}")
+                        # Retry on the next scheduled flush rather than immediately.
+                        failed = self._dirty.setdefault(guild_id, set())
+                        if path not in failed:
+                            failed.add(path)
+                            self._dirty_count += 1
+        self._evict()
 
     async def update_user(self, user: discord.Member, key: str, value: Any) -> None:
         """Update user cache and Config."""
-        await self.config.user(user).set_raw(key, value=value)
-        if user.id not in self._user_cache:
-            self._user_cache[user.id] = await self.config.user(user).all()
-        self._user_cache[user.id][key] = value
+        with metrics.timer("config.write"):
+            await self.config.user(user).set_raw(key, value=value)
+        (await self.get_user_settings(user))[key] = value
 
     async def clear_guild(self, guild: discord.Guild) -> None:
         """Clear guild settings and update cache."""
+        self._dirty_count -= len(self._dirty.pop(guild.id, ()))
         await self.config.guild(guild).clear()
-        self._guild_cache[guild.id] = await self.config.guild(guild).all()
+        self._guild_cache[guild.id] = _normalize_guild_data(await self.config.guild(guild).all())
+        self._guild_cache.move_to_end(guild.id)
+        self._last_access[guild.id] = time.monotonic()
+        await self._update_active_channel(guild.id)
 
     async def clear_user(self, user: discord.Member) -> None:
         """Clear user settings and update cache."""
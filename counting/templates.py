@@ -0,0 +1,126 @@
+"""
+MIT License
+
+Copyright (c) 2024-present IsThrill
+Originally created by ltzmax (2022-2025)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+# Placeholders each configurable message may use.
+TEMPLATE_FIELDS: Dict[str, FrozenSet[str]] = {
+    "default_next_number_message": frozenset({"next_count"}),
+    "default_edit_message": frozenset({"next_count"}),
+    "ruin_message": frozenset({"user", "count"}),
+    "goal_message": frozenset({"user", "goal", "count"}),
+    "progress_message": frozenset({"remaining", "goal"}),
+}
+
+# Example values used to check format specs such as ``{count:,}`` when a template is set.
+_SAMPLE_VALUES: Dict[str, Any] = {"user": "@user"}
+_SAMPLE_NUMBER = 1234
+
+_formatter = Formatter()
+
+
+class TemplateError(ValueError):
+    """Raised when a message template can't be used for its message."""
+
+
+class MessageTemplate(str):
+    """
+    A message template parsed once into literal text and placeholder slots.
+
+    The template is still the ``str`` it was set as, so it can be shown and stored like any
+    other setting, and ``render`` fills in the slots without parsing the text again.
+    """
+
+    _pieces: List[str]
+    _slots: Tuple[Tuple[int, str, str], ...]
+
+    def render(self, **values: Any) -> str:
+        """Fill in the placeholders. Every placeholder the template uses must be given."""
+        if not self._slots:
+            return self._pieces[0]
+        pieces = self._pieces.copy()
+        for index, name, spec in self._slots:
+            pieces[index] = format(values[name], spec)
+        return "".join(pieces)
+
+
+def _compile(key: str, text: str, strict: bool) -> MessageTemplate:
+    allowed = TEMPLATE_FIELDS[key]
+    pieces: List[str] = []
+    slots: List[Tuple[int, str, str]] = []
+    try:
+        parsed = list(_formatter.parse(text))
+    except ValueError as e:
+        if strict:
+            raise TemplateError(f"The message has unbalanced braces: {e}") from None
+        parsed = [(text, None, None, None)]
+
+    for literal, name, spec, conversion in parsed:
+        if literal:
+            pieces.append(literal)
+        if name is None:
+            continue
+        if name in allowed and not conversion and "{" not in spec:
+            sample = _SAMPLE_VALUES.get(name, _SAMPLE_NUMBER)
+            try:
+                format(sample, spec)
+            except ValueError:
+                if strict:
+                    raise TemplateError(f"`{{{name}:{spec}}}` is not a valid format.") from None
+            else:
+                slots.append((len(pieces), name, spec))
+                pieces.append("")
+                continue
+        elif strict and name in allowed:
+            raise TemplateError(f"`{{{name}}}` can't use conversions or nested placeholders.")
+        elif strict:
+            shown = ", ".join(f"`{{{field}}}`" for field in sorted(allowed)) or "none"
+            raise TemplateError(f"`{{{name}}}` can't be used here. Placeholders: {shown}.")
+        # Templates saved before validation existed keep unknown placeholders as plain text.
+        raw = name + (f"!{conversion}" if conversion else "") + (f":{spec}" if spec else "")
+        pieces.append(f"{{{raw}}}")
+
+    template = MessageTemplate(text)
+    if slots:
+        template._pieces = pieces
+    else:
+        template._pieces = ["".join(pieces)]
+    template._slots = tuple(slots)
+    return template
+
+
+@lru_cache(maxsize=1024)
+def compile_template(key: str, text: str, strict: bool = True) -> MessageTemplate:
+    """
+    Return the compiled template for setting ``key``.
+
+    Raises ``TemplateError`` if ``text`` is malformed or uses a placeholder the message
+    doesn't provide. With ``strict=False``, used for templates already in Config, problems
+    are left as plain text instead. Compiled templates are shared between guilds using the
+    same text.
+    """
+    return _compile(key, text, strict)
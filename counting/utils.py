@@ -23,13 +23,20 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import asyncio
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
 
 import discord
 from red_commons.logging import getLogger
 from redbot.core import Config
+from redbot.core.utils.views import SimpleMenu
+from redbot.vendored.discord.ext import menus
+
+from .metrics import metrics
+
+if TYPE_CHECKING:
+    from .actions import ActionQueue
+    from .expiry import RoleExpiryScheduler
 
 logger = getLogger("red.maxcogs.counting.utils")
 
@@ -46,7 +53,8 @@ async def send_message(
         send_kwargs = {"content": content, "silent": silent}
         if delete_after is not None:
             send_kwargs["delete_after"] = delete_after
-        return await channel.send(**send_kwargs)
+        with metrics.timer("api.send"):
+            return await channel.send(**send_kwargs)
     except discord.Forbidden:
         logger.warning(
             f"Missing send permissions in {channel.guild.name}#{channel.name} ({channel.id})"
@@ -56,19 +64,55 @@ async def send_message(
     return None
 
 
+class _LazyPageSource(menus.ListPageSource):
+    """Page source that renders each page only when the menu shows it."""
+
+    def __init__(self, render: Callable[[int], Awaitable[discord.Embed]], page_count: int):
+        super().__init__(range(page_count), per_page=1)
+        self._render = render
+
+    async def format_page(self, menu: SimpleMenu, page_number: int) -> discord.Embed:
+        return await self._render(page_number)
+
+
+class LazyMenu(SimpleMenu):
+    """A ``SimpleMenu`` whose pages are built by ``render(page_number)`` when shown."""
+
+    def __init__(
+        self,
+        render: Callable[[int], Awaitable[discord.Embed]],
+        page_count: int,
+        **kwargs: Any,
+    ):
+        # SimpleMenu only takes prebuilt pages, so it reads its pages through the ``source``
+        # property overridden below. It must be set before SimpleMenu lays out the buttons.
+        self._lazy_source = _LazyPageSource(render, page_count)
+        super().__init__(list(range(page_count)), **kwargs)
+
+    @property
+    def source(self) -> _LazyPageSource:
+        return self._lazy_source
+
+
+def lazy_menu(render: Callable[[int], Awaitable[discord.Embed]], page_count: int) -> SimpleMenu:
+    """Return a menu of ``page_count`` pages, each built by ``render(page_number)`` on demand."""
+    return LazyMenu(render, page_count, disable_after_timeout=True, timeout=120)
+
+
 async def delete_message(message: discord.Message) -> None:
     """Delete a message with error handling."""
     try:
-        await message.delete()
+        with metrics.timer("api.delete"):
+            await message.delete()
     except discord.HTTPException as e:
         logger.warning(f"Failed to delete message {message.id} in {message.channel.id}: {e}")
 
 
 async def add_reaction(message: discord.Message, reaction: str) -> None:
-    """Add a reaction with a delay."""
-    await asyncio.sleep(0.3)
+    """Add a reaction with error handling."""
     try:
-        await message.add_reaction(reaction)
+        with metrics.timer("api.react"):
+            await message.add_reaction(reaction)
     except discord.HTTPException as e:
         logger.warning(f"Failed to add reaction to {message.id} in {message.channel.id}: {e}")
 
@@ -78,9 +122,18 @@ async def handle_invalid_count(
     response: str,
     settings: dict[str, any],
     send_response: bool = True,
+    *,
+    actions: "ActionQueue | None" = None,
 ) -> None:
-    """Handle invalid counts by deleting and optionally responding."""
-    await delete_message(message)
+    """
+    Handle invalid counts by deleting and optionally responding.
+
+    With ``actions``, the deletion is queued so it can be batched with other deletions.
+    """
+    if actions is not None:
+        actions.delete(message.channel, message)
+    else:
+        await delete_message(message)
     if send_response:
         delete_after = (
             settings["delete_after"] if settings.get("toggle_delete_after", True) else None
@@ -94,9 +147,18 @@ async def handle_invalid_count(
 
 
 async def assign_ruin_role(
-    config: Config, member: discord.Member, guild: discord.Guild, settings: dict[str, Any]
+    config: Config,
+    member: discord.Member,
+    guild: discord.Guild,
+    settings: dict[str, Any],
+    *,
+    expiry_scheduler: "RoleExpiryScheduler | None" = None,
 ) -> None:
-    """Assign the ruin role to a member, temporarily if a duration is set."""
+    """
+    Assign the ruin role to a member, temporarily if a duration is set.
+
+    Temporary roles are recorded in ``temp_roles`` and handed to ``expiry_scheduler``.
+    """
     ruin_role_id = settings["ruin_role_id"]
     duration = settings["ruin_role_duration"]
     excluded_role_ids = settings["excluded_roles"]
@@ -117,41 +179,17 @@ async def assign_ruin_role(
         if not guild.me.guild_permissions.manage_roles:
             logger.warning(f"Missing manage_roles permission in {guild.name} ({guild.id})")
             return
-        await member.add_roles(role, reason="Ruined the count")
+        with metrics.timer("api.roles"):
+            await member.add_roles(role, reason="Ruined the count")
         if duration:
             expiry = datetime.now(timezone.utc) + timedelta(seconds=duration)
-            async with config.guild(guild).temp_roles() as temp_roles:
-                temp_roles[str(member.id)] = {
-                    "role_id": role.id,
-                    "expiry": expiry.timestamp(),
-                }
+            with metrics.timer("config.write"):
+                async with config.guild(guild).temp_roles() as temp_roles:
+                    temp_roles[str(member.id)] = {
+                        "role_id": role.id,
+                        "expiry": expiry.timestamp(),
+                    }
+            if expiry_scheduler is not None:
+                expiry_scheduler.schedule(guild.id, member.id, role.id, expiry.timestamp())
     except discord.Forbidden:
         logger.warning(f"Missing permissions to assign role {role.name} in {guild.name}")
-
-
-async def remove_expired_roles(config: Config, guild: discord.Guild) -> None:
-    """Remove expired temporary roles from users in a guild."""
-    async with config.guild(guild).temp_roles() as temp_roles:
-        to_remove = []
-        for user_id, data in temp_roles.items():
-            if datetime.now(timezone.utc).timestamp() >= data["expiry"]:
-                member = guild.get_member(int(user_id))
-                role = guild.get_role(data["role_id"])
-                if member and role:
-                    try:
-                        await member.remove_roles(role, reason="Temporary ruin role expired")
-                    except discord.HTTPException as e:
-                        if e.status == 429:
-                            logger.warning(
-                                f"Rate limited removing role {role.name} for {member.id}. Retrying after {e.retry_after}s."
-                            )
-                            await asyncio.sleep(e.retry_after)
-                            await member.remove_roles(role, reason="Temporary ruin role expired")
-                        elif isinstance(e, discord.Forbidden):
-                            logger.warning(f"Failed to remove role {role.name}: {e}")
-                        else:
-                            raise
-                to_remove.append(user_id)
-        for user_id in to_remove:
-
-            del temp_roles[user_id]
@@ -0,0 +1,166 @@
+"""
+MIT License
+
+Copyright (c) 2024-present IsThrill
+Originally created by ltzmax (2022-2025)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Benchmarks for the leaderboard scanner, run without a Discord connection.
+#
+#     python tools/bench.py [--messages 10000000] [--users 5000] [--tracemalloc]
+#
+# A seeded synthetic channel history is generated in chunks and fed to SequenceScanner.
+# Only the time spent inside the scanner is measured, so the figures track scanner
+# regressions rather than the generator's speed.
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from typing import Iterator, List, Optional
+
+from _counting import use_package_modules
+
+use_package_modules()
+
+from counting.scanner import ScanRecord, SequenceScanner  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def synthetic_history(
+    messages: int,
+    users: int = 5000,
+    *,
+    chunk_size: int = 100_000,
+    bot_rate: float = 0.01,
+    chatter_rate: float = 0.05,
+    restart_rate: float = 0.001,
+    mistake_rate: float = 0.02,
+    seed: int = 0,
+) -> Iterator[List[ScanRecord]]:
+    """
+    Yield a counting channel's history in chunks of ``chunk_size`` records.
+
+    Most messages are the next number. The rates set the share of bot messages, non-numeric
+    chatter, restarts from '1' and wrong numbers.
+    """
+    rng = random.Random(seed)
+    author_ids = [rng.randrange(1 << 40, 1 << 60) for _ in range(max(users, 1))]
+    bot_limit = bot_rate
+    chatter_limit = bot_limit + chatter_rate
+    restart_limit = chatter_limit + restart_rate
+    mistake_limit = restart_limit + mistake_rate
+    count = 0
+    remaining = messages
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        chunk: List[ScanRecord] = []
+        append = chunk.append
+        choice = rng.choice
+        for _ in range(size):
+            roll = rng.random()
+            author_id = choice(author_ids)
+            if roll < bot_limit:
+                append((author_id, True, str(count)))
+            elif roll < chatter_limit:
+                append((author_id, False, "nice"))
+            elif roll < restart_limit:
+                count = 1
+                append((author_id, False, "1"))
+            elif roll < mistake_limit:
+                append((author_id, False, str(count + 2)))
+            else:
+                count += 1
+                append((author_id, False, str(count)))
+        remaining -= size
+        yield chunk
+
+
+def _peak_rss_mib() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere.
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+def run(messages: int, users: int, seed: int = 0, trace_memory: bool = False) -> dict:
+    """Scan a synthetic history and return the throughput and memory figures."""
+    scanner = SequenceScanner()
+    if trace_memory:
+        tracemalloc.start()
+    scan_time = 0.0
+    started = time.perf_counter()
+    for chunk in synthetic_history(messages, users, seed=seed):
+        chunk_started = time.perf_counter()
+        scanner.feed_many(chunk)
+        scan_time += time.perf_counter() - chunk_started
+    total_time = time.perf_counter() - started
+    heap_peak = None
+    if trace_memory:
+        heap_peak = tracemalloc.get_traced_memory()[1] / (1 << 20)
+        tracemalloc.stop()
+    return {
+        "messages": scanner.message_count,
+        "valid_counts": scanner.valid_counts,
+        "unique_counters": len(scanner.counts),
+        "highest_count_found": scanner.highest_count_found,
+        "scan_seconds": scan_time,
+        "total_seconds": total_time,
+        "messages_per_second": scanner.message_count / scan_time if scan_time else 0.0,
+        "peak_rss_mib": _peak_rss_mib(),
+        "peak_heap_mib": heap_peak,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the leaderboard scanner.")
+    parser.add_argument("--messages", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="also report the Python heap peak (slows the run down noticeably)",
+    )
+    args = parser.parse_args(argv)
+
+    result = run(args.messages, args.users, args.seed, args.tracemalloc)
+    print(f"messages scanned:    {result['messages']:,}")
+    print(f"valid counts:        {result['valid_counts']:,}")
+    print(f"unique counters:     {result['unique_counters']:,}")
+    print(f"highest count:       {result['highest_count_found']:,}")
+    print(f"scanner time:        {result['scan_seconds']:.2f}s")
+    print(f"total time:          {result['total_seconds']:.2f}s (including generation)")
+    print(f"throughput:          {result['messages_per_second']:,.0f} messages/s")
+    if result["peak_rss_mib"] is not None:
+        print(f"peak RSS:            {result['peak_rss_mib']:.1f} MiB")
+    if result["peak_heap_mib"] is not None:
+        print(f"peak Python heap:    {result['peak_heap_mib']:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
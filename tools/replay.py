@@ -0,0 +1,751 @@
+"""
+MIT License
+
+Copyright (c) 2024-present IsThrill
+Originally created by ltzmax (2022-2025)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Replays counting traffic through the event handlers without a Discord connection.
+#
+#     python tools/replay.py [--events 20000] [--channels 4] [--counters 50] [--rate 0]
+#                            [--api-latency 0.002] [--no-ruin] [--archive export.json]
+#
+# Synthetic traffic has counters racing for the same number, wrong numbers, chatter, edits,
+# deletions and bulk deletions. ``--archive`` replays a channel export instead, in any format
+# ``countingset owner buildfromfile`` reads. Messages go through EventHandlers.on_message,
+# edits through on_raw_message_edit and deletions through on_raw_message_delete and
+# on_raw_bulk_message_delete, backed by the real SettingsManager on an in-memory Config.
+# Discord API calls are answered by fakes after ``--api-latency`` seconds, and messages the
+# bot deletes come back to the handlers as delete events, as they do from the gateway.
+#
+# Messages that arrive together are handled concurrently, the way a busy channel delivers
+# them; edits and deletions wait for the messages before them. Every channel is also run
+# through a plain sequential model of the counting rules, and at the end the count, last
+# counter and leaderboard of each guild, both cached and as written to Config, are compared
+# with it. Any difference (a double count, a lost update, a missed rollback) is reported
+# and makes the command exit with status 1.
+
+import argparse
+import asyncio
+import copy
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import discord
+from _counting import use_package_modules
+
+use_package_modules()
+
+from counting.archive import iter_archive  # noqa: E402
+from counting.event_handlers import EventHandlers  # noqa: E402
+from counting.history import HISTORY_SIZE  # noqa: E402
+from counting.metrics import metrics  # noqa: E402
+from counting.settings import DEFAULT_GLOBAL, DEFAULT_GUILD, DEFAULT_USER, SettingsManager  # noqa: E402
+
+_MISSING = object()
+
+
+class _Value:
+    """An awaitable ``group.key()`` that also works as ``async with group.key() as value``."""
+
+    def __init__(self, group: "MemoryGroup", key: str):
+        self._group = group
+        self._key = key
+        self._value: Any = None
+
+    def __await__(self):
+        return self._group.get_raw(self._key).__await__()
+
+    async def __aenter__(self) -> Any:
+        self._value = await self._group.get_raw(self._key)
+        return self._value
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._group.set_raw(self._key, value=self._value)
+
+
+class _Accessor:
+    def __init__(self, group: "MemoryGroup", key: str):
+        self._group = group
+        self._key = key
+
+    def __call__(self) -> _Value:
+        return _Value(self._group, self._key)
+
+    async def set(self, value: Any) -> None:
+        await self._group.set_raw(self._key, value=value)
+
+    async def clear(self) -> None:
+        await self._group.clear_raw(self._key)
+
+
+class MemoryGroup:
+    """One guild's, user's or the global settings in a ``MemoryConfig``."""
+
+    def __init__(self, data: Dict[str, Any], defaults: Dict[str, Any]):
+        self._data = data
+        self._defaults = defaults
+
+    def __getattr__(self, key: str) -> _Accessor:
+        if key.startswith("_"):
+            raise AttributeError(key)
+        return _Accessor(self, key)
+
+    async def all(self) -> Dict[str, Any]:
+        merged = copy.deepcopy(self._defaults)
+        merged.update(copy.deepcopy(self._data))
+        return merged
+
+    async def get_raw(self, *identifiers: str, default: Any = _MISSING) -> Any:
+        value: Any = await self.all()
+        for identifier in identifiers:
+            if not isinstance(value, dict) or identifier not in value:
+                if default is _MISSING:
+                    raise KeyError(identifier)
+                return default
+            value = value[identifier]
+        return value
+
+    async def set_raw(self, *identifiers: str, value: Any) -> None:
+        # A JSON round trip, like Red's JSON driver: keys become str and the value is copied.
+        value = json.loads(json.dumps(value))
+        node = self._data
+        for i, identifier in enumerate(identifiers[:-1]):
+            if identifier not in node:
+                default = self._defaults.get(identifier, {}) if i == 0 else {}
+                node[identifier] = copy.deepcopy(default)
+            node = node[identifier]
+        node[identifiers[-1]] = value
+
+    async def clear_raw(self, *identifiers: str) -> None:
+        node = self._data
+        for identifier in identifiers[:-1]:
+            node = node.get(identifier)
+            if not isinstance(node, dict):
+                return
+        node.pop(identifiers[-1], None)
+
+    async def clear(self) -> None:
+        self._data.clear()
+
+
+class MemoryConfig:
+    """An in-memory stand-in for the parts of Red's ``Config`` the counting cog uses."""
+
+    def __init__(self):
+        self._guild_defaults: Dict[str, Any] = {}
+        self._user_defaults: Dict[str, Any] = {}
+        self._global_defaults: Dict[str, Any] = {}
+        self._guilds: Dict[int, Dict[str, Any]] = {}
+        self._users: Dict[int, Dict[str, Any]] = {}
+        self._globals: Dict[str, Any] = {}
+
+    def register_guild(self, **defaults: Any) -> None:
+        self._guild_defaults.update(defaults)
+
+    def register_user(self, **defaults: Any) -> None:
+        self._user_defaults.update(defaults)
+
+    def register_global(self, **defaults: Any) -> None:
+        self._global_defaults.update(defaults)
+
+    def __getattr__(self, key: str) -> _Accessor:
+        if key.startswith("_"):
+            raise AttributeError(key)
+        return _Accessor(MemoryGroup(self._globals, self._global_defaults), key)
+
+    def guild_from_id(self, guild_id: int) -> MemoryGroup:
+        return MemoryGroup(self._guilds.setdefault(guild_id, {}), self._guild_defaults)
+
+    def guild(self, guild: discord.Guild) -> MemoryGroup:
+        return self.guild_from_id(guild.id)
+
+    def user_from_id(self, user_id: int) -> MemoryGroup:
+        return MemoryGroup(self._users.setdefault(user_id, {}), self._user_defaults)
+
+    def user(self, user: discord.abc.User) -> MemoryGroup:
+        return self.user_from_id(user.id)
+
+    async def all_guilds(self) -> Dict[int, Dict[str, Any]]:
+        return {guild_id: await self.guild_from_id(guild_id).all() for guild_id in self._guilds}
+
+    async def all_users(self) -> Dict[int, Dict[str, Any]]:
+        return {user_id: await self.user_from_id(user_id).all() for user_id in self._users}
+
+
+class FakeMember:
+    def __init__(self, user_id: int, guild: "FakeGuild", *, bot: bool = False):
+        self.id = user_id
+        self.guild = guild
+        self.bot = bot
+        self.mention = f"<@{user_id}>"
+        self.display_name = f"user-{user_id}"
+        self.created_at = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        self.roles: List[discord.Role] = []
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, bot_user_id: int):
+        self.id = guild_id
+        self.name = f"guild-{guild_id}"
+        self.me = FakeMember(bot_user_id, self, bot=True)
+        self.channels: Dict[int, "FakeChannel"] = {}
+        self.members: Dict[int, FakeMember] = {}
+
+    def get_channel(self, channel_id: int) -> Optional["FakeChannel"]:
+        return self.channels.get(channel_id)
+
+    def get_member(self, user_id: int) -> Optional[FakeMember]:
+        return self.members.get(user_id)
+
+    def get_role(self, role_id: int) -> None:
+        return None
+
+
+class FakeChannel(discord.TextChannel):
+    """A text channel whose API calls are answered locally after ``latency`` seconds."""
+
+    def __init__(self, channel_id: int, guild: FakeGuild, latency: float):
+        # discord.TextChannel.__init__ needs gateway state; only the fields used are set.
+        self.id = channel_id
+        self.guild = guild
+        self.name = f"counting-{channel_id}"
+        self.latency = latency
+        self.sent: List[str] = []
+        self.deleted: Set[int] = set()
+        self.reacted: Set[int] = set()
+        # Set once the handlers exist; deletions are reported back to them like Discord does.
+        self.handlers: Optional[EventHandlers] = None
+        self.delete_events: Set[int] = set()
+        self._delete_tasks: Set[asyncio.Task] = set()
+        self._delete_handled = asyncio.Condition()
+
+    def permissions_for(self, obj: Any) -> discord.Permissions:
+        return discord.Permissions.all()
+
+    async def send(self, content: Optional[str] = None, **kwargs: Any) -> None:
+        await asyncio.sleep(self.latency)
+        self.sent.append(content)
+
+    async def delete_messages(self, messages: Iterable[Any], *, reason: Optional[str] = None) -> None:
+        await asyncio.sleep(self.latency)
+        message_ids = {message.id for message in messages}
+        self.deleted.update(message_ids)
+        self.dispatch_delete(message_ids)
+
+    def dispatch_delete(self, message_ids: Set[int]) -> None:
+        """
+        Send the delete event for messages the bot deleted, the way the gateway would.
+
+        One message is deleted through the single delete endpoint, more through bulk delete.
+        """
+        if self.handlers is None:
+            return
+        task = asyncio.create_task(self._handle_delete(message_ids))
+        self._delete_tasks.add(task)
+        task.add_done_callback(self._delete_tasks.discard)
+
+    async def _handle_delete(self, message_ids: Set[int]) -> None:
+        if len(message_ids) == 1:
+            (message_id,) = message_ids
+            await self.handlers.on_raw_message_delete(FakeRawEvent(self, message_id=message_id))
+        else:
+            await self.handlers.on_raw_bulk_message_delete(
+                FakeRawEvent(self, message_ids=message_ids)
+            )
+        async with self._delete_handled:
+            self.delete_events.update(message_ids)
+            self._delete_handled.notify_all()
+
+    async def wait_for_delete(self, message_id: int) -> None:
+        """Wait until the bot has deleted a message and its delete event has been handled."""
+        async with self._delete_handled:
+            await self._delete_handled.wait_for(lambda: message_id in self.delete_events)
+
+    async def settle(self) -> None:
+        """Wait for every delete event still being handled."""
+        while self._delete_tasks:
+            await asyncio.gather(*self._delete_tasks)
+
+
+class FakeMessage:
+    def __init__(self, message_id: int, channel: FakeChannel, author: FakeMember, content: str):
+        self.id = message_id
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.created_at = discord.utils.snowflake_time(message_id)
+
+    async def delete(self) -> None:
+        await asyncio.sleep(self.channel.latency)
+        self.channel.deleted.add(self.id)
+        self.channel.dispatch_delete({self.id})
+
+    async def add_reaction(self, reaction: str) -> None:
+        await asyncio.sleep(self.channel.latency)
+        self.channel.reacted.add(self.id)
+
+
+class FakeRawEvent:
+    """
+    The fields of a raw gateway event that the handlers read.
+
+    Stands in for ``discord.RawMessageUpdateEvent`` and the raw delete events, whose
+    constructors change between discord.py versions.
+    """
+
+    def __init__(self, channel: FakeChannel, **fields: Any):
+        self.channel_id = channel.id
+        self.guild_id = channel.guild.id
+        self.__dict__.update(fields)
+
+
+class FakeBot:
+    def __init__(self):
+        self.user_id = 1
+        self.guilds: List[FakeGuild] = []
+        self._channels: Dict[int, FakeChannel] = {}
+
+    def add_channel(self, channel: FakeChannel) -> None:
+        if channel.guild not in self.guilds:
+            self.guilds.append(channel.guild)
+        channel.guild.channels[channel.id] = channel
+        self._channels[channel.id] = channel
+
+    def get_guild(self, guild_id: int) -> Optional[FakeGuild]:
+        return next((guild for guild in self.guilds if guild.id == guild_id), None)
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self._channels.get(channel_id)
+
+    def get_user(self, user_id: int) -> None:
+        return None
+
+    def get_cog(self, name: str) -> None:
+        return None
+
+    async def cog_disabled_in_guild(self, cog: Any, guild: FakeGuild) -> bool:
+        return False
+
+    async def wait_until_ready(self) -> None:
+        return None
+
+
+class CountingModel:
+    """The counting rules for one channel, applied one event at a time."""
+
+    def __init__(self, same_user_to_count: bool, allow_ruin: bool, rollback_window: int):
+        self.same_user_to_count = same_user_to_count
+        self.allow_ruin = allow_ruin
+        self.rollback_window = rollback_window
+        self.count = 0
+        self.last_user_id: Optional[int] = None
+        self.leaderboard: Counter = Counter()
+        # (message_id, author_id) of the counts that can still be rolled back, oldest first.
+        self.history: List[Tuple[int, int]] = []
+        self.accepted = 0
+        self.rolled_back = 0
+
+    def message(self, message_id: int, author_id: int, content: str) -> None:
+        if self.same_user_to_count and self.last_user_id == author_id:
+            return
+        content = content.strip()
+        if content.isdecimal() and int(content) == self.count + 1:
+            self.count += 1
+            self.last_user_id = author_id
+            self.leaderboard[author_id] += 1
+            self.history.append((message_id, author_id))
+            del self.history[:-HISTORY_SIZE]
+            self.accepted += 1
+        elif self.allow_ruin:
+            self.ruin()
+
+    def edit(self, message_id: int) -> None:
+        if self.allow_ruin:
+            self.ruin()
+        # The bot deletes the edited count, and Discord reports that deletion like any other.
+        self.delete({message_id})
+
+    def delete(self, message_ids: Set[int]) -> None:
+        positions = [i for i, (message_id, _) in enumerate(self.history) if message_id in message_ids]
+        if not positions or len(self.history) - min(positions) > self.rollback_window:
+            return
+        dropped = self.history[min(positions) :]
+        del self.history[min(positions) :]
+        for _, author_id in dropped:
+            self.leaderboard[author_id] -= 1
+        self.count -= len(dropped)
+        self.last_user_id = self.history[-1][1] if self.history else None
+        self.rolled_back += len(dropped)
+
+    def ruin(self) -> None:
+        self.count = 0
+        self.last_user_id = None
+        self.history.clear()
+
+
+# A step is a batch of messages handled concurrently, or a single edit or deletion.
+Step = Tuple[str, Any]
+
+
+def synthetic_traffic(
+    model: CountingModel,
+    author_ids: List[int],
+    events: int,
+    rng: random.Random,
+    ids: Iterator[int],
+    *,
+    race_rate: float = 0.1,
+    mistake_rate: float = 0.01,
+    chatter_rate: float = 0.03,
+    edit_rate: float = 0.005,
+    delete_rate: float = 0.01,
+    bulk_delete_rate: float = 0.002,
+    max_batch: int = 6,
+) -> Iterator[Step]:
+    """
+    Yield ``events`` events for one channel, applying each to ``model`` as it is generated.
+
+    Most steps are a batch of counters sending the next numbers in quick succession. A race
+    is several counters sending the same number at once; only the first may count.
+    """
+    race_limit = race_rate
+    mistake_limit = race_limit + mistake_rate
+    chatter_limit = mistake_limit + chatter_rate
+    edit_limit = chatter_limit + edit_rate
+    delete_limit = edit_limit + delete_rate
+    bulk_limit = delete_limit + bulk_delete_rate
+    sent: List[int] = []
+    remaining = events
+    while remaining > 0:
+        roll = rng.random()
+        if roll < race_limit:
+            batch = [(rng.choice(author_ids), str(model.count + 1)) for _ in range(rng.randint(2, 4))]
+        elif roll < mistake_limit:
+            batch = [(rng.choice(author_ids), str(model.count + rng.randint(2, 9)))]
+        elif roll < chatter_limit:
+            batch = [(rng.choice(author_ids), "nice")]
+        elif roll < bulk_limit and model.history:
+            recent = [message_id for message_id, _ in model.history[-30:]]
+            if roll < edit_limit:
+                message_id, author_id = rng.choice(model.history[-20:])
+                model.edit(message_id)
+                remaining -= 1
+                yield "edit", (message_id, author_id)
+            elif roll < delete_limit:
+                message_id = rng.choice(recent)
+                model.delete({message_id})
+                remaining -= 1
+                yield "delete", message_id
+            else:
+                message_ids = set(rng.sample(recent, min(len(recent), rng.randint(2, 5))))
+                message_ids.update(rng.sample(sent[-50:], min(len(sent), 3)))
+                model.delete(message_ids)
+                remaining -= 1
+                yield "bulk_delete", message_ids
+            continue
+        else:
+            size = min(rng.randint(1, max_batch), len(author_ids))
+            authors = rng.sample(author_ids, size)
+            batch = [(author_id, str(model.count + 1 + i)) for i, author_id in enumerate(authors)]
+
+        batch = batch[:remaining]
+        messages = []
+        for author_id, content in batch:
+            message_id = next(ids)
+            model.message(message_id, author_id, content)
+            sent.append(message_id)
+            messages.append((message_id, author_id, content))
+        remaining -= len(messages)
+        yield "messages", messages
+
+
+def archive_traffic(
+    model: CountingModel, path: Path, batch_size: int, limit: Optional[int] = None
+) -> Iterator[Step]:
+    """Yield the human messages of an exported channel in batches of ``batch_size``."""
+    records = (record for record in iter_archive(path) if not record[2])
+    records = itertools.islice(records, limit)
+    while batch := list(itertools.islice(records, batch_size)):
+        for message_id, author_id, _, content in batch:
+            model.message(message_id, author_id, content)
+        yield "messages", [(message_id, author_id, content) for message_id, author_id, _, content in batch]
+
+
+class _Samples:
+    """Collects every metrics observation so exact percentiles can be reported."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    def __call__(self, name: str, seconds: float) -> None:
+        self.samples.setdefault(name, []).append(seconds * 1000)
+
+    def summary(self, name: str) -> Optional[Dict[str, float]]:
+        values = sorted(self.samples.get(name, ()))
+        if not values:
+            return None
+
+        def percentile(p: float) -> float:
+            return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+        return {
+            "count": len(values),
+            "p50": percentile(50),
+            "p95": percentile(95),
+            "p99": percentile(99),
+            "max": values[-1],
+        }
+
+
+async def _play(
+    handlers: EventHandlers,
+    channel: FakeChannel,
+    steps: Iterator[Step],
+    rate: float,
+) -> int:
+    """Feed one channel's steps to the handlers, at most ``rate`` events a second if set."""
+    guild = channel.guild
+    handled = 0
+    started = time.perf_counter()
+    for kind, data in steps:
+        if kind == "messages":
+            messages = []
+            for message_id, author_id, content in data:
+                author = guild.members.get(author_id)
+                if author is None:
+                    author = guild.members[author_id] = FakeMember(author_id, guild)
+                messages.append(FakeMessage(message_id, channel, author, content))
+            await asyncio.gather(*(handlers.on_message(message) for message in messages))
+            handled += len(messages)
+        elif kind == "edit":
+            message_id, author_id = data
+            payload = FakeRawEvent(
+                channel,
+                message_id=message_id,
+                data={"id": str(message_id), "content": "edited", "author": {"id": str(author_id)}},
+            )
+            await handlers.on_raw_message_edit(payload)
+            # The deletion lands before anything else is sent, so the model can apply it in order.
+            await channel.wait_for_delete(message_id)
+            handled += 1
+        elif kind == "delete":
+            payload = FakeRawEvent(channel, message_id=data)
+            await handlers.on_raw_message_delete(payload)
+            handled += 1
+        else:
+            payload = FakeRawEvent(channel, message_ids=set(data))
+            await handlers.on_raw_bulk_message_delete(payload)
+            handled += 1
+        if rate:
+            ahead = started + handled / rate - time.perf_counter()
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+    return handled
+
+
+def _compare(label: str, state: Dict[str, Any], model: CountingModel) -> List[str]:
+    problems = []
+    if state["count"] != model.count:
+        problems.append(f"{label}: count is {state['count']}, expected {model.count}")
+    if state["last_user_id"] != model.last_user_id:
+        problems.append(
+            f"{label}: last counter is {state['last_user_id']}, expected {model.last_user_id}"
+        )
+    expected = {user_id: n for user_id, n in model.leaderboard.items() if n}
+    actual = {int(user_id): n for user_id, n in state["leaderboard"].items() if n}
+    for user_id in sorted(expected.keys() | actual.keys()):
+        if expected.get(user_id, 0) != actual.get(user_id, 0):
+            problems.append(
+                f"{label}: user {user_id} has {actual.get(user_id, 0)} counts, "
+                f"expected {expected.get(user_id, 0)}"
+            )
+    return problems
+
+
+async def replay(
+    events: int = 20_000,
+    channels: int = 4,
+    counters: int = 50,
+    *,
+    rate: float = 0.0,
+    api_latency: float = 0.002,
+    allow_ruin: bool = True,
+    archive: Optional[Path] = None,
+    batch_size: int = 8,
+    seed: int = 0,
+) -> dict:
+    """
+    Replay traffic through a fresh ``EventHandlers`` and return the figures and problems found.
+
+    With ``archive``, its messages are replayed in one channel (at most ``events`` of them)
+    and ``channels`` and ``counters`` are ignored.
+    """
+    config = MemoryConfig()
+    config.register_guild(**copy.deepcopy(dict(DEFAULT_GUILD)))
+    config.register_user(**copy.deepcopy(dict(DEFAULT_USER)))
+    config.register_global(**copy.deepcopy(dict(DEFAULT_GLOBAL)))
+    settings = SettingsManager(config)
+    bot = FakeBot()
+    ids = itertools.count(discord.utils.time_snowflake(datetime.now(timezone.utc)))
+    rng = random.Random(seed)
+    if archive is not None:
+        channels = 1
+
+    runs = []
+    for i in range(channels):
+        guild = FakeGuild(1000 + i, bot.user_id)
+        channel = FakeChannel(2000 + i, guild, api_latency)
+        bot.add_channel(channel)
+        group = config.guild(guild)
+        for key, value in (
+            ("channel", channel.id),
+            ("toggle", True),
+            ("same_user_to_count", True),
+            ("allow_ruin", allow_ruin),
+            ("toggle_reactions", True),
+            ("toggle_next_number_message", True),
+        ):
+            await group.set_raw(key, value=value)
+        model = CountingModel(
+            same_user_to_count=True,
+            allow_ruin=allow_ruin,
+            rollback_window=DEFAULT_GUILD["rollback_window"],
+        )
+        if archive is not None:
+            steps = archive_traffic(model, archive, batch_size, events)
+        else:
+            author_ids = [rng.randrange(1 << 40, 1 << 60) for _ in range(max(counters, 2))]
+            steps = synthetic_traffic(
+                model, author_ids, events // channels, random.Random(rng.random()), ids
+            )
+        runs.append((channel, model, steps))
+
+    samples = _Samples()
+    metrics.reset()
+    metrics.add_hook(samples)
+    await settings.initialize()
+    handlers = EventHandlers(bot, settings)
+    for channel, _, _ in runs:
+        channel.handlers = handlers
+    try:
+        started = time.perf_counter()
+        handled = await asyncio.gather(
+            *(_play(handlers, channel, steps, rate) for channel, _, steps in runs)
+        )
+        elapsed = time.perf_counter() - started
+        await handlers.actions.close()
+        await handlers.bursts.close()
+        for channel, _, _ in runs:
+            await channel.settle()
+    finally:
+        handlers.role_expiry.stop()
+        await settings.close()
+        metrics.remove_hook(samples)
+
+    problems = []
+    for channel, model, _ in runs:
+        cached = await settings.get_guild_settings(channel.guild)
+        problems += _compare(f"guild {channel.guild.id} (cache)", cached, model)
+        stored = await config.guild(channel.guild).all()
+        problems += _compare(f"guild {channel.guild.id} (Config)", stored, model)
+
+    total = sum(handled)
+    return {
+        "events": total,
+        "channels": channels,
+        "seconds": elapsed,
+        "events_per_second": total / elapsed if elapsed else 0.0,
+        "accepted": sum(model.accepted for _, model, _ in runs),
+        "rolled_back": sum(model.rolled_back for _, model, _ in runs),
+        "api_calls": sum(
+            len(channel.sent) + len(channel.reacted) for channel, _, _ in runs
+        ),
+        "latency": {
+            name: samples.summary(name)
+            for name in ("handler.message", "handler.edit", "handler.delete", "queue_wait")
+        },
+        "problems": problems,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Replay counting traffic through the event handlers and check the result."
+    )
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument("--counters", type=int, default=50, help="counters per channel")
+    parser.add_argument(
+        "--rate", type=float, default=0.0, help="events per second per channel (0: unthrottled)"
+    )
+    parser.add_argument(
+        "--api-latency", type=float, default=0.002, help="seconds each fake API call takes"
+    )
+    parser.add_argument("--no-ruin", action="store_true", help="reject wrong numbers instead")
+    parser.add_argument("--archive", type=Path, help="replay an exported channel instead")
+    parser.add_argument("--batch", type=int, default=8, help="archive messages handled at once")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(
+        replay(
+            args.events,
+            args.channels,
+            args.counters,
+            rate=args.rate,
+            api_latency=args.api_latency,
+            allow_ruin=not args.no_ruin,
+            archive=args.archive,
+            batch_size=args.batch,
+            seed=args.seed,
+        )
+    )
+    print(f"events replayed:     {result['events']:,} over {result['channels']} channel(s)")
+    print(f"accepted counts:     {result['accepted']:,} ({result['rolled_back']:,} rolled back)")
+    print(f"fake API calls:      {result['api_calls']:,} sends and reactions")
+    print(f"time:                {result['seconds']:.2f}s")
+    print(f"throughput:          {result['events_per_second']:,.0f} events/s")
+    for name, summary in result["latency"].items():
+        if summary is not None:
+            print(
+                f"{name + ':':<20} p50 {summary['p50']:.2f}ms  p95 {summary['p95']:.2f}ms  "
+                f"p99 {summary['p99']:.2f}ms  max {summary['max']:.2f}ms  (n={summary['count']:,})"
+            )
+    if result["problems"]:
+        print(f"\n{len(result['problems'])} problem(s) found:")
+        for problem in result["problems"][:50]:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("state matches the model: no double counts or lost updates")
+
+
+if __name__ == "__main__":
+    main()